@@ -0,0 +1,108 @@
+"""
+Benchmarks for ok_mvp.chunk_utils on a CORPUS_HARD_CAP_CHARS-sized corpus.
+
+Compares the original character-based chunk_text (kept here as the reference) with
+span-based chunking, reporting wall time, peak traced memory, chunk count and the
+largest chunk in tokens. With tiktoken installed the spans are also checked against
+exact token counts of the materialized chunks.
+
+Usage:
+    python benchmarks/bench_chunking.py [--chars 600000] [--max-tokens 8000] [--overlap 0] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, PROJECT_ROOT)
+
+from ok_mvp.chunk_utils import _TIKTOKEN_AVAILABLE, CharEstimator, chunk_spans, get_token_counter  # noqa: E402
+from ok_mvp.text_utils import vtt_to_text  # noqa: E402
+
+
+def reference_chunk_text(text: str, max_chars: int) -> list:
+    """The original paragraph packer that sized chunks in characters."""
+    chunks, buf, buf_len = [], [], 0
+    for para in text.split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        if buf_len + len(para) + 2 <= max_chars:
+            buf.append(para)
+            buf_len += len(para) + 2
+        else:
+            if buf:
+                chunks.append("\n\n".join(buf))
+            if len(para) > max_chars:
+                for start in range(0, len(para), max_chars):
+                    chunks.append(para[start:start + max_chars])
+                buf, buf_len = [], 0
+            else:
+                buf, buf_len = [para], len(para)
+    if buf:
+        chunks.append("\n\n".join(buf))
+    return chunks
+
+
+def _corpus(chars: int) -> str:
+    """Papers and transcripts from the fixtures, interleaved until `chars` is reached."""
+    parts = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+            raw = f.read()
+        parts.append(vtt_to_text(raw, strip_tags=True) if name.endswith(".vtt") else raw)
+    block = "\n\n".join(parts)
+    return ("\n\n".join([block] * (chars // len(block) + 1)))[:chars]
+
+
+def _measure(fn, repeat: int) -> tuple:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark token-budgeted chunking on a large corpus.")
+    parser.add_argument("--chars", type=int, default=600_000, help="Corpus size in characters.")
+    parser.add_argument("--max-tokens", type=int, default=8000, help="Token budget per chunk.")
+    parser.add_argument("--overlap", type=int, default=0, help="Overlap tokens between chunks.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported).")
+    args = parser.parse_args()
+
+    text = _corpus(args.chars)
+    counters = {"estimate": CharEstimator()}
+    if _TIKTOKEN_AVAILABLE:
+        counters["tiktoken"] = get_token_counter()
+        counters["calibrated"] = CharEstimator.calibrate(counters["tiktoken"], [text[:50_000]])
+    print(f"corpus {len(text):,} chars, budget {args.max_tokens:,} tokens, overlap {args.overlap}")
+
+    failures = 0
+    ref_time, ref_peak, ref_chunks = _measure(lambda: reference_chunk_text(text, args.max_tokens * 4), args.repeat)
+    print(f"{'reference (chars)':<22} {ref_time * 1e3:8.1f} ms  peak {ref_peak / 1e6:6.2f} MB  "
+          f"{len(ref_chunks):>4} chunks")
+    for name, counter in counters.items():
+        span_time, span_peak, spans = _measure(
+            lambda: chunk_spans(text, args.max_tokens, args.overlap, counter), args.repeat)
+        largest = max(chunk.tokens for chunk in spans)
+        line = (f"{'spans/' + name:<22} {span_time * 1e3:8.1f} ms  peak {span_peak / 1e6:6.2f} MB  "
+                f"{len(spans):>4} chunks  largest {largest:,} tokens")
+        if "tiktoken" in counters:
+            exact = max(counters["tiktoken"](chunk.text(text)) for chunk in spans)
+            failures += exact > args.max_tokens
+            line += f" (exact {exact:,})"
+        print(line)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Benchmarks for ok_mvp.compress_utils: compression ratio and CPU time of the extractive
+pre-compression applied before chunk_text.
+
+The paper fixture goes through PDF boilerplate removal and then sentence ranking; the
+caption fixtures are converted to transcripts first. Each input is also replicated to a
+larger size to approximate a full CORPUS_HARD_CAP_CHARS corpus.
+
+Usage:
+    python benchmarks/bench_compress_utils.py [--scale 100] [--ratio 0.6] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, PROJECT_ROOT)
+
+from ok_mvp.compress_utils import compress_text, strip_pdf_boilerplate  # noqa: E402
+from ok_mvp.text_utils import vtt_to_text  # noqa: E402
+
+
+def _load_inputs() -> dict:
+    inputs = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        path = os.path.join(FIXTURES_DIR, name)
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            raw = f.read()
+        if name.endswith(".vtt"):
+            inputs[name] = ("transcript", vtt_to_text(raw, strip_tags=True))
+        elif name.endswith(".txt"):
+            inputs[name] = ("pdf", raw)
+    return inputs
+
+
+def _best_cpu(fn, arg, repeat: int) -> tuple:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.process_time()
+        out = fn(arg)
+        best = min(best, time.process_time() - started)
+    return best, out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extractive pre-compression on recorded fixtures.")
+    parser.add_argument("--scale", type=int, default=100, help="Replication factor for the large run.")
+    parser.add_argument("--ratio", type=float, default=0.6, help="Target fraction of characters to keep.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported).")
+    args = parser.parse_args()
+
+    for name, (kind, text) in _load_inputs().items():
+        for label, sample in (("fixture", text), (f"x{args.scale}", "\n\n".join([text] * args.scale))):
+            strip_time, stripped = (_best_cpu(strip_pdf_boilerplate, sample, args.repeat)
+                                    if kind == "pdf" else (0.0, sample))
+            rank_time, compressed = _best_cpu(lambda t: compress_text(t, args.ratio), stripped, args.repeat)
+            cpu = strip_time + rank_time
+            print(f"{name:<32} {label:>7} {len(sample):>10,} chars  "
+                  f"stripped {len(stripped) / len(sample):6.1%}  kept {len(compressed) / len(sample):6.1%}  "
+                  f"~{(len(sample) - len(compressed)) // 4:>9,} tokens saved  "
+                  f"cpu {cpu * 1e3:8.1f} ms ({len(sample) / (cpu or 1e-9) / 1e6:5.1f} MB/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
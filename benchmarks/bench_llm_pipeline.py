@@ -0,0 +1,121 @@
+"""
+Offline benchmark of the pipeline's LLM stages against a local or replayed backend.
+
+Runs hypothesis generation, search terms (per hypothesis), per-source map summaries over the
+fixtures and the synthesis (per hypothesis) through the same code paths and the shared LLM
+limiter as a live run, with no API key and no network. The stand-in is seeded, so two runs with
+the same arguments make the same calls, see the same failures and produce the same answers.
+Token use and (simulated) cached-token hit rates are reported per prompt version.
+
+Usage:
+    python benchmarks/bench_llm_pipeline.py [--backend local] [--latency 0.8] [--sigma 0.5]
+        [--tps 80] [--error-rate 0.05] [--seed 0] [--hypotheses 3] [--sources 6]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["local", "replay"], default="local")
+    parser.add_argument("--latency", type=float, default=0.8, help="Median time to first token (s).")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal shape of the latency.")
+    parser.add_argument("--tps", type=float, default=80, help="Output tokens per second.")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of calls failing with 429/500.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hypotheses", type=int, default=3)
+    parser.add_argument("--sources", type=int, default=6, help="Fixture sources map-summarized per hypothesis.")
+    return parser.parse_args()
+
+
+args = _parse_args()
+# The backend is chosen from the environment when ok_mvp.config is imported.
+os.environ.update({
+    "LLM_BACKEND": args.backend, "LLM_STANDIN_LATENCY_MEDIAN": str(args.latency),
+    "LLM_STANDIN_LATENCY_SIGMA": str(args.sigma), "LLM_STANDIN_TOKENS_PER_SECOND": str(args.tps),
+    "LLM_STANDIN_ERROR_RATE": str(args.error_rate), "LLM_STANDIN_SEED": str(args.seed),
+    "LLM_BACKOFF_BASE": "0.2",
+})
+
+from ok_mvp import generate_hypotheses, generate_search_terms  # noqa: E402
+from ok_mvp.concurrency_utils import get_llm_limiter  # noqa: E402
+from ok_mvp.llm_backend_utils import get_llm_client  # noqa: E402
+from ok_mvp.llm_utils import map_summarize  # noqa: E402
+from ok_mvp.pipeline_utils import MapPipeline  # noqa: E402
+from ok_mvp.run_toolkit_research import synthesize_content  # noqa: E402
+from ok_mvp.stream_utils import stream_chat_json  # noqa: E402
+from ok_mvp.text_utils import vtt_to_text  # noqa: E402
+from ok_mvp.usage_utils import llm_usage, take_calls, usage_report  # noqa: E402
+
+PROFILE = {"name": "Benchmark Founder", "skills": ["machine learning", "healthcare operations"],
+           "interests": ["preventative care", "wearables"], "experience_years": 8}
+
+
+def _fixture_texts():
+    texts = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+            raw = f.read()
+        texts.append(vtt_to_text(raw, strip_tags=True) if name.endswith(".vtt") else raw)
+    return texts
+
+
+async def _research(client, hypothesis, terms, texts):
+    pipeline = MapPipeline(summarize=map_summarize, dedupe=False)
+    evidence = [{"title": f"Fixture {i}", "url": None, "type": "arXiv"} for i in range(len(texts))]
+    for source, text in zip(evidence, texts):
+        pipeline.submit(source, text)
+    await pipeline.finish()
+    contents = [pipeline.summary_for(source) for source in evidence]
+    return await asyncio.to_thread(synthesize_content, client, contents, hypothesis, terms, evidence)
+
+
+async def run():
+    client = get_llm_client()
+    timings = {}
+
+    started = time.perf_counter()
+    hypotheses = generate_hypotheses.coerce_hypotheses(
+        stream_chat_json(client, None, None, **generate_hypotheses.build_request(PROFILE)))[:args.hypotheses]
+    timings["hypotheses"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    terms = await asyncio.gather(*[
+        asyncio.to_thread(stream_chat_json, client, "search_terms", None, **generate_search_terms.build_request(h))
+        for h in hypotheses])
+    timings["search_terms"] = time.perf_counter() - started
+
+    fixtures = _fixture_texts()
+    texts = [fixtures[i % len(fixtures)] + f"\n\nSource variant {i}." for i in range(args.sources)]
+    started = time.perf_counter()
+    results = await asyncio.gather(*[_research(client, h, t["search_terms"], texts) for h, t in zip(hypotheses, terms)])
+    timings["map + synthesis"] = time.perf_counter() - started
+
+    print(f"backend={args.backend} latency={args.latency}s sigma={args.sigma} tps={args.tps} "
+          f"error_rate={args.error_rate} seed={args.seed}")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<16} {seconds:7.2f}s")
+    print(f"  total            {sum(timings.values()):7.2f}s")
+    print(f"  opportunities    {sum(len(r.get('synthesized_opportunities', [])) for r in results)}")
+    print(f"  limiter          {get_llm_limiter().metrics()}")
+
+
+def _print_usage():
+    report = usage_report(take_calls("benchmark"))
+    print("  usage by prompt  calls  prompt_tok  cached_tok  hit_rate  static_prefix")
+    for prompt, row in report["by_prompt"].items():
+        print(f"    {prompt:<14} {row['calls']:5d}  {row['prompt_tokens']:10,d}  {row['cached_tokens']:10,d}  "
+              f"{row['cache_hit_rate']:8.2f}  {row.get('static_prefix_tokens', 0):6d}")
+
+
+if __name__ == "__main__":
+    with llm_usage(submission_id="benchmark"):
+        asyncio.run(run())
+    _print_usage()
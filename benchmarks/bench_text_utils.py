@@ -0,0 +1,122 @@
+"""
+Benchmarks for ok_mvp.text_utils against the recorded caption fixtures.
+
+Each fixture is parsed by the original multi-pass regex implementation (kept here as
+the reference) and by the current streaming parser. Outputs must match exactly; the
+fixture is also replicated to a larger size to mimic an hour-long auto-caption track.
+The rolling-window dedupe is compared the same way and reported in lines per second.
+
+Usage:
+    python benchmarks/bench_text_utils.py [--scale 400] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, PROJECT_ROOT)
+
+from ok_mvp.text_utils import finalize_text, iter_deduped, iter_vtt_lines, vtt_to_text  # noqa: E402
+
+
+def reference_vtt_to_text(vtt: str, window: int = 3, strip_tags: bool = False) -> str:
+    """The original seven-pass implementation, used as the compatibility oracle."""
+    vtt = re.sub(r"^\ufeff?WEBVTT.*?\n+", "", vtt, flags=re.IGNORECASE | re.DOTALL)
+    vtt = re.sub(r"(?m)^NOTE.*?(?:\n\n|\Z)", "", vtt, flags=re.DOTALL)
+    vtt = re.sub(r"(?m)^STYLE.*?(?:\n\n|\Z)", "", vtt, flags=re.DOTALL)
+    vtt = re.sub(r"\d{2}:\d{2}:\d{2}\.\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}.*", "", vtt)
+    vtt = re.sub(r"(?m)^\d+\s*$", "", vtt)
+    vtt = re.sub(r"<[^>]+>", "", vtt)
+    lines = [ln.strip() for ln in vtt.splitlines() if ln.strip()]
+    return finalize_text(lines, window=window, strip_tags=strip_tags)
+
+
+def reference_dedupe_with_window(lines: list, window: int, strip_tags: bool) -> list:
+    """The original list-based rolling dedupe with uncompiled normalization."""
+    def normalize(s: str) -> str:
+        s = s.lower()
+        s = re.sub(r"\[.*?\]|\(.*?\)", "", s)
+        s = re.sub(r"[^\w\s']+", "", s)
+        return re.sub(r"\s+", " ", s).strip()
+
+    out, recent_norms = [], []
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if strip_tags:
+            line = re.sub(r"(?i)\s*(\[[^\]]+\]|\([^)]+\))\s*", " ", line)
+            line = re.sub(r"\s+", " ", line).strip()
+            if not line:
+                continue
+        norm = normalize(line)
+        if norm and norm not in recent_norms:
+            out.append(line)
+            recent_norms.append(norm)
+            if len(recent_norms) > max(1, window):
+                recent_norms.pop(0)
+    return out
+
+
+def _load_fixtures() -> dict:
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".vtt"):
+            with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8", newline="") as f:
+                fixtures[name] = f.read()
+    return fixtures
+
+
+def _scaled(vtt: str, scale: int) -> str:
+    """Replicate the cue body `scale` times behind a single header."""
+    header, _, body = vtt.partition("\n\n")
+    return header + "\n\n" + "\n".join([body] * scale)
+
+
+def _best_of(fn, arg, repeat: int) -> tuple:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark VTT parsing against recorded fixtures.")
+    parser.add_argument("--scale", type=int, default=400, help="Replication factor for the large run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported).")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, vtt in _load_fixtures().items():
+        for label, text in (("fixture", vtt), (f"x{args.scale}", _scaled(vtt, args.scale))):
+            ref_time, expected = _best_of(reference_vtt_to_text, text, args.repeat)
+            new_time, actual = _best_of(vtt_to_text, text, args.repeat)
+            stream_time, streamed = _best_of(vtt_to_text, text.encode("utf-8"), args.repeat)
+            ok = expected == actual == streamed
+            failures += not ok
+            print(f"{name:<32} {label:>6} {len(text) / 1e6:7.2f} MB  "
+                  f"reference {ref_time * 1e3:8.1f} ms  streaming {new_time * 1e3:8.1f} ms  "
+                  f"bytes {stream_time * 1e3:8.1f} ms  {'OK' if ok else 'MISMATCH'}")
+
+    print()
+    for name, vtt in _load_fixtures().items():
+        lines = list(iter_vtt_lines(_scaled(vtt, args.scale)))
+        for window in (3, 50):
+            ref_time, expected = _best_of(lambda ls: reference_dedupe_with_window(ls, window, True), lines, args.repeat)
+            new_time, actual = _best_of(lambda ls: list(iter_deduped(ls, window, True)), lines, args.repeat)
+            roll_time, rolled = _best_of(lambda ls: list(iter_deduped(ls, window, True, 3)), lines, args.repeat)
+            ok = expected == actual
+            failures += not ok
+            print(f"dedupe {name:<32} window={window:<3} {len(lines):>7} lines  "
+                  f"reference {len(lines) / ref_time:>10,.0f} l/s  ring {len(lines) / new_time:>10,.0f} l/s  "
+                  f"rolling {len(lines) / roll_time:>10,.0f} l/s ({len(rolled)} kept)  {'OK' if ok else 'MISMATCH'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
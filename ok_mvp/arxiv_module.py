@@ -1,11 +1,14 @@
 # ok_mvp/arxiv_module.py
 import asyncio
-import os
+import io
 import arxiv
 import pypdf
 
 # Assuming these utilities are in your project
 from .cache_utils import get_from_cache, save_to_cache
+from .compress_utils import strip_pdf_boilerplate
+from .config import PRECOMPRESS_STRIP_PDF_BOILERPLATE
+from .http_utils import http_get
 from .logger import get_logger
 
 logger = get_logger()
@@ -17,21 +20,25 @@ def _search_papers(query, max_results):
     logger.info(f"  [ArXiv] Found {len(papers)} papers.")
     return papers
 
+def _clean_paper_text(text):
+    # The cache keeps the full extraction; references and captions are dropped on the way out.
+    return strip_pdf_boilerplate(text) if PRECOMPRESS_STRIP_PDF_BOILERPLATE else text
+
 def _get_paper_text(paper):
     paper_id = paper.entry_id.split('/')[-1]
     cached = get_from_cache("arxiv", paper_id)
-    if cached: return cached
+    if cached: return _clean_paper_text(cached)
     try:
-        pdf_path = paper.download_pdf()
-        text = "".join(page.extract_text() or "" for page in pypdf.PdfReader(pdf_path).pages)
-        os.remove(pdf_path)
+        # Download through the shared keep-alive pool and parse in memory (no temp file).
+        pdf_bytes = http_get(paper.pdf_url).content
+        text = "".join(page.extract_text() or "" for page in pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
         save_to_cache("arxiv", paper_id, text)
-        return text
+        return _clean_paper_text(text)
     except Exception as e:
         logger.error(f"  [ArXiv] Could not process paper '{paper.title}': {e}")
         return ""
 
-async def research(search_terms: list[str], config: dict) -> tuple:
+async def research(search_terms: list[str], config: dict, on_source=None) -> tuple:
     print("  Calling ArXiv Module...")
     max_results = config.get("MAX_RESULTS_PER_SOURCE", 3)
     main_query = search_terms[0] if search_terms else ""
@@ -45,10 +52,12 @@ async def research(search_terms: list[str], config: dict) -> tuple:
     for paper in papers:
         paper_text = await loop.run_in_executor(None, _get_paper_text, paper)
         if paper_text:
-            source_evidence.append({
+            evidence = {
                 "index": -1, "source_type": "arXiv",
                 "title": paper.title, "author": ", ".join(str(a) for a in paper.authors),
                 "url": paper.entry_id, "key_quote": "",
-            })
+            }
+            if on_source: on_source(evidence, paper_text)
+            source_evidence.append(evidence)
             content_for_synthesis.append(paper_text)
     return source_evidence, content_for_synthesis
\ No newline at end of file
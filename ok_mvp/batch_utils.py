@@ -0,0 +1,193 @@
+# ok_mvp/batch_utils.py
+"""
+Batch-completions backends for the offline bulk mode (see run_batch.py).
+
+Requests are written as JSONL in the OpenAI Batch API format, one chat completion per
+line keyed by `custom_id`. A backend takes the file, runs it asynchronously and hands back
+{custom_id: message content}. Two backends are provided:
+  - `OpenAIBatchBackend`: the provider's Batch API (cheaper, higher limits, up to 24h);
+  - `LocalBatchBackend`: a file-based stand-in that answers from a responder function, so
+    the whole bulk flow can run offline.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger()
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+# Batch states as reported by the backends.
+PENDING, COMPLETED, FAILED = "pending", "completed", "failed"
+
+
+def chat_request(custom_id: str, request: dict) -> dict:
+    """One JSONL line of a batch file for chat completion arguments (model, messages, ...)."""
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": request}
+
+
+def write_batch_file(path: str, requests: List[dict]) -> str:
+    """Write batch request lines to `path` (directories are created) and return the path."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in requests:
+            f.write(json.dumps(line) + "\n")
+    return path
+
+
+def parse_batch_output(text: str) -> Dict[str, Optional[str]]:
+    """Map each custom_id in a batch output file to its message content (None on error)."""
+    results: Dict[str, Optional[str]] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        if row.get("error") or response.get("status_code", 200) != 200:
+            logger.warning(f"[Batch] Request {row.get('custom_id')} failed: {row.get('error') or response}")
+            results[row["custom_id"]] = None
+            continue
+        choices = (response.get("body") or {}).get("choices") or [{}]
+        results[row["custom_id"]] = (choices[0].get("message") or {}).get("content")
+    return results
+
+
+class BatchBackend(ABC):
+    """Interface: submit a batch file, poll its state, fetch its results."""
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, path: str) -> str:
+        """Submit the JSONL batch file at `path`; returns a batch ID."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """PENDING, COMPLETED or FAILED."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """{custom_id: message content} for a completed batch."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The OpenAI Batch API: upload the file, create a batch, download the output file."""
+
+    name = "openai"
+
+    def __init__(self, client, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=CHAT_COMPLETIONS_URL,
+                                           completion_window=self.completion_window)
+        logger.info(f"[Batch] Submitted {path} as OpenAI batch {batch.id}.")
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        state = self.client.batches.retrieve(batch_id).status
+        if state == "completed":
+            return COMPLETED
+        if state in ("failed", "expired", "cancelled"):
+            return FAILED
+        return PENDING
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = parse_batch_output(self.client.files.content(batch.output_file_id).text) \
+            if batch.output_file_id else {}
+        if batch.error_file_id:
+            results.update(parse_batch_output(self.client.files.content(batch.error_file_id).text))
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for a batch provider.
+
+    `submit` copies the requests into `directory`; once `delay` seconds have passed, the first
+    `status` call answers every request with `responder(body)` and writes an output file in the
+    provider's format, so resuming works exactly as it does against the real API.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str, responder: Callable[[dict], str], delay: float = 0.0):
+        self.directory = Path(directory)
+        self.responder = responder
+        self.delay = delay
+
+    def _paths(self, batch_id: str):
+        return self.directory / f"{batch_id}.input.jsonl", self.directory / f"{batch_id}.output.jsonl"
+
+    def submit(self, path: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        input_path, _ = self._paths(batch_id)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        input_path.write_text(Path(path).read_text(encoding="utf-8"), encoding="utf-8")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        input_path, output_path = self._paths(batch_id)
+        if output_path.exists():
+            return COMPLETED
+        if not input_path.exists():
+            return FAILED
+        if time.time() - os.path.getmtime(input_path) < self.delay:
+            return PENDING
+        with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                content = self.responder(row["body"])
+                out.write(json.dumps({
+                    "custom_id": row["custom_id"],
+                    "response": {"status_code": 200,
+                                 "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}},
+                    "error": None,
+                }) + "\n")
+        return COMPLETED
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        _, output_path = self._paths(batch_id)
+        return parse_batch_output(output_path.read_text(encoding="utf-8"))
+
+
+def canned_response(body: dict) -> str:
+    """
+    Schema-valid placeholder answer for the pipeline's prompts (hypotheses, search terms, batched
+    search terms, synthesis, map summaries), recognised from the prompt text. Used by the offline stand-ins.
+    """
+    prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if '"synthesized_opportunities"' in prompt:
+        return json.dumps({"synthesized_opportunities": [
+            {"idea": f"Placeholder opportunity {i}", "description": "Offline stand-in answer.",
+             "supporting_evidence_indices": [0]} for i in range(1, 4)
+        ]})
+    if '"search_terms_by_hypothesis"' in prompt:
+        count = len(re.findall(r"# OPPORTUNITY HYPOTHESIS \d+", prompt))
+        return json.dumps({"search_terms_by_hypothesis": [
+            {"hypothesis_number": n, "search_terms": [f"placeholder search term {n}.{i}" for i in range(1, 11)]}
+            for n in range(1, count + 1)
+        ]})
+    if '"search_terms"' in prompt:
+        return json.dumps({"search_terms": [f"placeholder search term {i}" for i in range(1, 11)]})
+    if "hypothesis_name" in prompt:
+        return json.dumps([
+            {"hypothesis_name": f"Placeholder hypothesis {i}", "hypothesis_description": "Offline stand-in answer.",
+             "business_model": "SaaS", "target_customer": "Placeholder customer"} for i in range(1, 4)
+        ])
+    return "- Offline stand-in summary."
@@ -0,0 +1,153 @@
+# ok_mvp/compress_utils.py
+"""
+Offline extractive pre-compression applied before text is chunked for the LLM.
+
+Two steps, both local and CPU-cheap:
+  - PDF boilerplate removal: reference lists, acknowledgements and figure/table captions.
+  - Sentence centrality ranking: each sentence is scored by TF-IDF cosine similarity to the
+    document centroid, sponsor reads and filler are demoted, and the top sentences are
+    kept (in original order) until the target fraction of characters is reached.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import List
+
+from .config import PRECOMPRESS_MIN_CHARS
+from .retrieval_utils import tokenize
+
+_REFERENCES_RE = re.compile(r"(?im)^[ \t]*(?:\d+\.?[ \t]*)?(references|bibliography|works cited)[ \t]*$")
+_APPENDIX_RE = re.compile(r"(?im)^[ \t]*(?:appendix\b|supplementary material)")
+_ACKNOWLEDGEMENTS_RE = re.compile(r"(?im)^[ \t]*(?:\d+\.?[ \t]*)?acknowledge?ments?[ \t]*$")
+_HEADING_RE = re.compile(r"(?m)^[ \t]*(?:\d+(?:\.\d+)*\.?[ \t]+[A-Z][^\n]{0,60}|[A-Z][A-Za-z ]{2,40})[ \t]*$")
+_CAPTION_RE = re.compile(r"(?im)^[ \t]*(?:figure|fig\.|table)[ \t]*\d+[a-z]?[ \t]*[:.|][^\n]*\n?")
+# Sentences may span PDF/caption line wraps; a terminator only counts before whitespace ("6.2" stays whole).
+_SENTENCE_RE = re.compile(r"(?s)\S.*?(?:[.!?]+[\"')\]]*(?=\s|\Z)|\Z)")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# Unpunctuated text (auto-captions) is cut into pseudo-sentences of this many words.
+_MAX_SENTENCE_WORDS = 40
+# Sponsor reads and calls to action in podcast/YouTube transcripts.
+_SPONSOR_RE = re.compile(
+    r"(?i)\b(sponsored by|brought to you by|promo code|use code|discount code|"
+    r"link in the description|smash that|subscribe to|patreon|our sponsor)\b"
+)
+
+
+def strip_pdf_boilerplate(text: str) -> str:
+    """
+    Remove the reference list, acknowledgements and figure/table captions from paper text.
+
+    Args:
+        text: Text extracted from a PDF.
+
+    Returns:
+        The text without those sections; an appendix after the references or acknowledgements
+        is kept.
+    """
+    # Reference list: the last "References" heading in the second half of the paper.
+    refs = [m for m in _REFERENCES_RE.finditer(text) if m.start() > len(text) // 2]
+    if refs:
+        start = refs[-1].start()
+        appendix = _APPENDIX_RE.search(text, refs[-1].end())
+        text = text[:start] + (text[appendix.start():] if appendix else "")
+
+    # Acknowledgements: like the references, only a heading in the second half counts. Just the
+    # section's first paragraph is dropped (up to the next blank line or heading), so text after
+    # it, e.g. an appendix whose headings _HEADING_RE does not know, is never cut off.
+    acks = [m for m in _ACKNOWLEDGEMENTS_RE.finditer(text) if m.start() > len(text) // 2]
+    if acks:
+        ack = acks[-1]
+        body = len(text) - len(text[ack.end():].lstrip())
+        ends = [m.start() for m in (_PARAGRAPH_RE.search(text, body), _HEADING_RE.search(text, body)) if m]
+        if ends:
+            text = text[:ack.start()] + text[min(ends):]
+
+    return _CAPTION_RE.sub("", text)
+
+
+def split_sentences(text: str) -> List[List[str]]:
+    """
+    Split text into paragraphs of sentences, with line wraps inside a sentence collapsed
+    to single spaces. Runs of more than _MAX_SENTENCE_WORDS unpunctuated words are split.
+
+    Args:
+        text: Any text; paragraphs are separated by blank lines.
+
+    Returns:
+        One list of non-empty sentences per non-empty paragraph.
+    """
+    paragraphs = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        sentences = []
+        for match in _SENTENCE_RE.finditer(paragraph):
+            words = match.group().split()
+            for i in range(0, len(words), _MAX_SENTENCE_WORDS):
+                sentences.append(" ".join(words[i:i + _MAX_SENTENCE_WORDS]))
+        if sentences:
+            paragraphs.append(sentences)
+    return paragraphs
+
+
+def _sentence_scores(sentences: List[str]) -> List[float]:
+    """TF-IDF cosine similarity of each sentence to the document centroid (linear time)."""
+    tfs = [Counter(tokenize(s)) for s in sentences]
+    df = Counter(term for tf in tfs for term in tf)
+    n = len(sentences)
+    idf = {term: math.log(1 + n / count) for term, count in df.items()}
+
+    vectors = []
+    centroid: Counter = Counter()
+    for tf in tfs:
+        vec = {term: count * idf[term] for term, count in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vec = {term: v / norm for term, v in vec.items()}
+        vectors.append(vec)
+        centroid.update(vec)
+    centroid_norm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+
+    scores = []
+    for sentence, vec in zip(sentences, vectors):
+        score = sum(v * centroid[term] for term, v in vec.items()) / centroid_norm
+        if len(vec) < 4:
+            score *= 0.5  # fillers and fragments ("yeah", "right, so") carry little
+        if _SPONSOR_RE.search(sentence):
+            score *= 0.1
+        scores.append(score)
+    return scores
+
+
+def compress_text(text: str, ratio: float) -> str:
+    """
+    Keep the most central sentences of `text` until about `ratio` of its characters remain.
+
+    Args:
+        text: Document text (PDF boilerplate should already be stripped).
+        ratio: Target fraction of characters to keep, in (0, 1]; 1 returns the text unchanged.
+
+    Returns:
+        The selected sentences in original order, paragraphs separated by blank lines.
+    """
+    if ratio >= 1 or len(text) < PRECOMPRESS_MIN_CHARS:
+        return text
+    paragraphs = split_sentences(text)
+    flat = [(p, s) for p, sentences in enumerate(paragraphs) for s in sentences]
+    if len(flat) < 3:
+        return text
+
+    scores = _sentence_scores([s for _, s in flat])
+    target = ratio * sum(len(s) + 1 for _, s in flat)
+    keep = set()
+    kept_chars = 0
+    for i in sorted(range(len(flat)), key=lambda i: scores[i], reverse=True):
+        if kept_chars >= target:
+            break
+        keep.add(i)
+        kept_chars += len(flat[i][1]) + 1
+
+    out: List[List[str]] = [[] for _ in paragraphs]
+    for i, (p, sentence) in enumerate(flat):
+        if i in keep:
+            out[p].append(sentence)
+    return "\n\n".join(" ".join(sentences) for sentences in out if sentences)
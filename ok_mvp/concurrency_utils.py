@@ -0,0 +1,165 @@
+# ok_mvp/concurrency_utils.py
+"""
+Adaptive concurrency and retries for rate-limited APIs (used for every LLM call).
+
+`AIMDLimiter` caps in-flight calls across all threads. The cap grows additively (about +1
+per cap's worth of successes) and is halved on a throttle (429), the same additive-increase /
+multiplicative-decrease rule TCP uses to find the highest sustainable rate. Throttles and
+server errors (5xx, timeouts, dropped connections) are retried with full-jitter exponential
+backoff, honoring Retry-After when the server sends one; other errors are raised at once.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional, Tuple
+
+from .config import (
+    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+)
+from .logger import get_logger
+from .usage_utils import record_llm_call
+
+logger = get_logger()
+
+THROTTLED, RETRYABLE, FATAL = "throttled", "retryable", "fatal"
+_RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceUnavailableError")
+
+
+def classify_error(e: Exception) -> Tuple[str, Optional[float]]:
+    """
+    Classify an API exception by its HTTP status (duck-typed, so any SDK works).
+
+    Returns:
+        (THROTTLED | RETRYABLE | FATAL, retry_after seconds or None).
+    """
+    response = getattr(e, "response", None)
+    status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = None
+    try:
+        if headers.get("retry-after-ms"):
+            retry_after = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            retry_after = float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass  # HTTP-date form; fall back to our own backoff
+    if status == 429:
+        return THROTTLED, retry_after
+    if (isinstance(status, int) and status >= 500) or type(e).__name__ in _RETRYABLE_ERRORS:
+        return RETRYABLE, retry_after
+    return FATAL, None
+
+
+class AIMDLimiter:
+    """Thread-safe AIMD concurrency limit with retrying `call`, plus live metrics."""
+
+    def __init__(self, initial: int, max_limit: int, min_limit: int = 1, decrease: float = 0.5,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 name: str = "LLM"):
+        self.name = name
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limit = float(min(max(initial, min_limit), self.max_limit))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._completed: deque = deque()  # completion times within the last minute
+        self._counts = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "throttle_events": 0}
+
+    def _acquire(self) -> float:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def _release(self, started: float, outcome: Optional[str]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if outcome == THROTTLED:
+                self._counts["throttle_events"] += 1
+                # One decrease per round trip: throttles of calls started before the last decrease
+                # were sent at the old limit and must not compound it.
+                if started > self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+                    logger.info(f"[{self.name}] Throttled; concurrency limit now {int(self._limit)}.")
+            elif outcome is None:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                self._completed.append(now)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` within the limit, retrying throttles and server errors."""
+        with self._cond:
+            self._counts["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            started = self._acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind, retry_after = classify_error(e)
+                self._release(started, kind)
+                if kind == FATAL or attempt == self.max_retries:
+                    with self._cond:
+                        self._counts["failed"] += 1
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                with self._cond:
+                    self._counts["retries"] += 1
+                logger.warning(f"[{self.name}] {kind} error ({e}); retry {attempt + 1} in {delay:.1f}s.")
+                time.sleep(delay)
+                continue
+            self._release(started, None)
+            with self._cond:
+                self._counts["succeeded"] += 1
+            return result
+
+    def metrics(self) -> dict:
+        """In-flight calls, current limit, counters and effective requests per minute (last 60s)."""
+        with self._cond:
+            cutoff = time.monotonic() - 60
+            while self._completed and self._completed[0] < cutoff:
+                self._completed.popleft()
+            return {"in_flight": self._in_flight, "concurrency_limit": int(self._limit),
+                    "requests_per_minute": len(self._completed), **self._counts}
+
+
+_llm_limiter: Optional[AIMDLimiter] = None
+_llm_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter() -> AIMDLimiter:
+    """The process-wide limiter shared by all LLM calls (clients should use max_retries=0)."""
+    global _llm_limiter
+    with _llm_limiter_lock:
+        if _llm_limiter is None:
+            _llm_limiter = AIMDLimiter(LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                                       backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX)
+        return _llm_limiter
+
+
+def chat_completion(client, **request) -> Any:
+    """`client.chat.completions.create(**request)` through the shared LLM limiter, with usage recorded."""
+    started = time.perf_counter()
+    try:
+        response = get_llm_limiter().call(client.chat.completions.create, **request)
+    except Exception as e:
+        record_llm_call(request, None, time.perf_counter() - started, error=e)
+        raise
+    record_llm_call(request, getattr(response, "usage", None), time.perf_counter() - started,
+                    content=response.choices[0].message.content or "")
+    return response
@@ -5,8 +5,33 @@ import os
 # Default LLM model (OpenAI Chat Completions API name)
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
+# ------------ HTTP ---------------
+# Shared keep-alive pools used for caption, PDF and GraphQL downloads (see http_utils.py).
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # number of per-host pools
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # connections kept alive per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))  # seconds
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))  # seconds
+# Negotiate HTTP/2 when httpx + h2 are installed (the "http2" extra: pip install "ok-mvp[http2]").
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "1") == "1"
+# httpx has no per-host pools, so the HTTP/2 client ignores HTTP_POOL_MAXSIZE and caps the whole
+# process instead: at most HTTP2_MAX_CONNECTIONS open and HTTP2_MAX_KEEPALIVE idle connections
+# across all hosts (HTTP/2 multiplexes requests, so one connection per host is usually enough).
+HTTP2_MAX_CONNECTIONS = int(os.getenv("HTTP2_MAX_CONNECTIONS",
+                                      str(HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE)))
+HTTP2_MAX_KEEPALIVE = int(os.getenv("HTTP2_MAX_KEEPALIVE", str(HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE)))
+
 # ------------ YouTube ------------
 TOP_N_YOUTUBE_VIDEOS = int(os.getenv("TOP_N_YOUTUBE_VIDEOS", "5"))
+# Two-phase search: a fast flat search returns IDs/titles, and the full per-video
+# extraction (caption URLs) only runs for videos that actually need the VTT fallback.
+YOUTUBE_FLAT_SEARCH = os.getenv("YOUTUBE_FLAT_SEARCH", "1") == "1"
+# Hedged transcript fetch: race the Transcript API against the VTT caption path.
+# The VTT path starts after YOUTUBE_HEDGE_DELAY seconds (0 = immediately), or as soon as the API gives up.
+YOUTUBE_HEDGED_FETCH = os.getenv("YOUTUBE_HEDGED_FETCH", "0") == "1"
+YOUTUBE_HEDGE_DELAY = float(os.getenv("YOUTUBE_HEDGE_DELAY", "2.0"))  # seconds
+# Progressive-caption dedupe: drop words a caption line repeats from the end of the previous one
+# when at least this many words overlap (0 disables; only exact windowed dedupe is applied).
+YOUTUBE_ROLLING_CAPTION_OVERLAP = int(os.getenv("YOUTUBE_ROLLING_CAPTION_OVERLAP", "0"))
 
 # ------------ arXiv --------------
 TOP_N_ARXIV_PAPERS = int(os.getenv("TOP_N_ARXIV_PAPERS", "5"))
@@ -15,11 +40,67 @@ TOP_N_ARXIV_PAPERS = int(os.getenv("TOP_N_ARXIV_PAPERS", "5"))
 TOP_N_PODCAST_EPISODES = int(os.getenv("TOP_N_PODCAST_EPISODES", "5"))
 PODCAST_TRANSCRIPT_POLL_INTERVAL = int(os.getenv("PODCAST_TRANSCRIPT_POLL_INTERVAL", "30"))  # seconds
 PODCAST_TRANSCRIPT_TIMEOUT = int(os.getenv("PODCAST_TRANSCRIPT_TIMEOUT", "600"))  # 10 minutes
+# On-demand transcription (PRD FR-2): request transcripts for episodes that have none and poll them.
+# Opt-in, because every request spends paid Taddy on-demand credits.
+PODCAST_ONDEMAND_TRANSCRIPTS = os.getenv("PODCAST_ONDEMAND_TRANSCRIPTS", "0") == "1"
+# Polling starts at this interval and backs off towards PODCAST_TRANSCRIPT_POLL_INTERVAL.
+PODCAST_TRANSCRIPT_POLL_MIN = float(os.getenv("PODCAST_TRANSCRIPT_POLL_MIN", "5"))  # seconds
+# How long one research() call waits for on-demand jobs before moving on without them.
+PODCAST_ONDEMAND_RUN_WAIT = float(os.getenv("PODCAST_ONDEMAND_RUN_WAIT", "120"))  # seconds
+# How long the process keeps polling leftover jobs at exit so they land in the cache.
+PODCAST_TRANSCRIPT_DRAIN_SECONDS = float(os.getenv("PODCAST_TRANSCRIPT_DRAIN_SECONDS", "60"))  # seconds
+# Taddy rate limiting (PRD NFR-2/NFR-3): max in-flight requests per process, and 429 backoff.
+TADDY_MAX_CONCURRENCY = int(os.getenv("TADDY_MAX_CONCURRENCY", "3"))
+TADDY_MAX_RETRIES = int(os.getenv("TADDY_MAX_RETRIES", "4"))
+TADDY_BACKOFF_BASE = float(os.getenv("TADDY_BACKOFF_BASE", "2.0"))  # seconds, doubled per retry
+# Episodes packed into one aliased GraphQL transcript request (1 disables batching).
+TADDY_TRANSCRIPT_BATCH_SIZE = int(os.getenv("TADDY_TRANSCRIPT_BATCH_SIZE", "10"))
+
+# ------------ Streaming ----------
+# Stream JSON completions (hypotheses, search terms, opportunities) and parse them incrementally,
+# so each item can be acted on as soon as it is complete.
+LLM_STREAM_JSON = os.getenv("LLM_STREAM_JSON", "1") == "1"
+
+# ------------ LLM call control ----
+# Every chat completion goes through one adaptive limiter (concurrency_utils.AIMDLimiter):
+# concurrency grows by ~1 per round of successes up to LLM_MAX_CONCURRENCY and halves on a 429.
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# 429s, 5xx errors and timeouts are retried with full-jitter exponential backoff (Retry-After wins).
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))  # seconds, doubled per retry
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# ------------ LLM backend ---------
+# "openai" (the API), "local" (deterministic offline stand-in with canned JSON answers),
+# "record" (the API, recording every answer to LLM_RECORDING_PATH) or "replay" (answer from it).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_RECORDING_PATH = os.getenv("LLM_RECORDING_PATH", os.path.join("output", "_llm", "recording.jsonl"))
+LLM_REPLAY_TIMING = os.getenv("LLM_REPLAY_TIMING", "0") == "1"  # reproduce recorded latencies
+# Stand-in behaviour: log-normal time to first token, output rate, share of calls failing (429/500).
+LLM_STANDIN_LATENCY_MEDIAN = float(os.getenv("LLM_STANDIN_LATENCY_MEDIAN", "0.8"))  # seconds
+LLM_STANDIN_LATENCY_SIGMA = float(os.getenv("LLM_STANDIN_LATENCY_SIGMA", "0.5"))
+LLM_STANDIN_TOKENS_PER_SECOND = float(os.getenv("LLM_STANDIN_TOKENS_PER_SECOND", "80"))
+LLM_STANDIN_ERROR_RATE = float(os.getenv("LLM_STANDIN_ERROR_RATE", "0"))
+LLM_STANDIN_SEED = int(os.getenv("LLM_STANDIN_SEED", "0"))
+
+# ------------ Search terms ------
+# "concurrent": one request per hypothesis, all in flight at once; "batched": one request for all
+# hypotheses (misses are requested individually); "sequential": one after another.
+SEARCH_TERMS_MODE = os.getenv("SEARCH_TERMS_MODE", "concurrent")
+# Collapse near-synonym search terms into one query per cluster (see term_utils); terms join a
+# cluster only if their normalized token sets have at least this Jaccard similarity to every member.
+SEARCH_TERM_CLUSTERING = os.getenv("SEARCH_TERM_CLUSTERING", "1") == "1"
+SEARCH_TERM_SIMILARITY = float(os.getenv("SEARCH_TERM_SIMILARITY", "0.8"))
 
 # ------------ Chunking / Limits ---
-# We estimate ~4 chars per token; add a safety margin. These limits keep us far below 128k tokens.
-# Max characters per chunk we send to the LLM in one message (map step).
-CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", str(120_000)))  # ~30k tokens
+# Max tokens per chunk we send to the LLM in one message (map step); keeps us far below 128k tokens.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", str(30_000)))
+# Tokens of trailing sentences repeated at the start of the next chunk (0 = no overlap).
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+# "auto" counts with tiktoken when installed, else estimates; "estimate" always estimates.
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "auto")
+CHUNK_CHARS_PER_TOKEN = float(os.getenv("CHUNK_CHARS_PER_TOKEN", "4.0"))  # estimator calibration
 
 # Hard cap on total corpus characters to summarize (prevents extreme inputs).
 CORPUS_HARD_CAP_CHARS = int(os.getenv("CORPUS_HARD_CAP_CHARS", str(600_000)))  # ~150k tokens
@@ -27,5 +108,58 @@ CORPUS_HARD_CAP_CHARS = int(os.getenv("CORPUS_HARD_CAP_CHARS", str(600_000)))  #
 # When we do map-reduce, we cap how many intermediate summaries we join for the reduce step.
 MAX_MAP_SUMMARIES_FOR_REDUCE = int(os.getenv("MAX_MAP_SUMMARIES_FOR_REDUCE", "30"))
 
+# ------------ Synthesis ----------
+# Character budget for source text in the synthesis prompt.
+SYNTHESIS_MAX_CHARS = int(os.getenv("SYNTHESIS_MAX_CHARS", str(12_000)))
+# Rank passages with a local BM25 index and pack the best ones into the budget
+# (0 = each source contributes its leading text, up to its share of the budget).
+SYNTHESIS_RELEVANCE_RANKING = os.getenv("SYNTHESIS_RELEVANCE_RANKING", "1") == "1"
+PASSAGE_MAX_CHARS = int(os.getenv("PASSAGE_MAX_CHARS", "1200"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# How the budget is shared between sources: "equal" (by source-type weight) or
+# "proportional" (by source length times weight). Unused share is redistributed.
+SYNTHESIS_BUDGET_MODE = os.getenv("SYNTHESIS_BUDGET_MODE", "equal")
+# Optional per-source-type weights, e.g. "Podcast=2,arXiv=1,YouTube=1" (default 1 each).
+SYNTHESIS_SOURCE_WEIGHTS = os.getenv("SYNTHESIS_SOURCE_WEIGHTS", "")
+
+# ------------ Map pipeline -------
+# Map-summarize each source as soon as it is fetched and synthesize from the per-source summaries,
+# overlapping LLM time with fetch time (0 = synthesize directly from the raw source text).
+MAP_PIPELINE = os.getenv("MAP_PIPELINE", "0") == "1"
+MAP_PIPELINE_CONCURRENCY = int(os.getenv("MAP_PIPELINE_CONCURRENCY", "4"))  # sources summarized at once
+# Cache per-source map summaries (keyed by source, content hash, model and prompt version)
+# so a rerun only summarizes new or changed sources.
+SUMMARY_CACHE = os.getenv("SUMMARY_CACHE", "1") == "1"
+
+# ------------ Near-duplicate collapsing ------------
+# Collapse near-duplicate sources and passages (MinHash over word shingles) before synthesis.
+DEDUPE_NEAR_DUPLICATES = os.getenv("DEDUPE_NEAR_DUPLICATES", "1") == "1"
+DEDUPE_JACCARD_THRESHOLD = float(os.getenv("DEDUPE_JACCARD_THRESHOLD", "0.8"))
+DEDUPE_SHINGLE_WORDS = int(os.getenv("DEDUPE_SHINGLE_WORDS", "5"))
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", "16"))  # 16 bands x 4 rows
+
+# ------------ Pre-compression ------------
+# Extractive compression applied before chunk_text: drop PDF references/acknowledgements/captions,
+# then keep the most central sentences up to PRECOMPRESS_RATIO of the characters (1 disables).
+PRECOMPRESS_STRIP_PDF_BOILERPLATE = os.getenv("PRECOMPRESS_STRIP_PDF_BOILERPLATE", "1") == "1"
+PRECOMPRESS_RATIO = float(os.getenv("PRECOMPRESS_RATIO", "0.6"))
+PRECOMPRESS_MIN_CHARS = int(os.getenv("PRECOMPRESS_MIN_CHARS", "4000"))  # shorter texts are left as-is
+
+# ------------ Bulk mode ----------
+# Offline bulk runs (run_batch.py) submit each stage's LLM requests as one batch file.
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai")  # "openai" (Batch API) or "local" (file-based stand-in)
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join("output", "_batches"))  # batch files and resumable run state
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))  # seconds between status checks
+
+# ------------ Profile ingestion ---
+# create_new_profile reads only the mapped Tally columns once, indexed by Submission ID; with
+# PROFILE_SNAPSHOT the parsed table is kept as a Parquet snapshot (keyed by the CSV's mtime and
+# SHA-256 and the mapped columns) so later runs skip the CSV parse. Opt-in: it needs a Parquet
+# engine (pip install "ok-mvp[snapshot]", i.e. pyarrow).
+PROFILE_SNAPSHOT = os.getenv("PROFILE_SNAPSHOT", "0") == "1"
+PROFILE_SNAPSHOT_DIR = os.getenv("PROFILE_SNAPSHOT_DIR", os.path.join("output", "_profiles"))
+
 # Tokens allocation hints (not enforced, but used to size prompts)
 MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", "1500"))  # target output per call
@@ -1,82 +1,238 @@
 # ok_mvp/create_new_profile.py
 """
-Finds a specific submission in a Tally.so CSV export from the 'input' folder,
-transforms it to JSON, and saves it in a new directory inside the 'output' folder.
+Finds submissions in a Tally.so CSV export from the 'input' folder, transforms them to JSON,
+and saves each in a new directory inside the 'output' folder.
+
+The CSV is read once per run, and only the mapped columns are parsed, into a table indexed by
+Submission ID, so exporting a whole batch costs one read. With PROFILE_SNAPSHOT (off by default;
+needs the "snapshot" extra, i.e. pyarrow) the parsed table is also saved as a Parquet snapshot,
+keyed by the CSV's modification time and SHA-256 and by the mapped columns; a later run on the
+unchanged export with the same column mapping loads the snapshot instead of parsing the CSV.
+
+Usage:
+    python -m ok_mvp.create_new_profile [SUBMISSION_ID ...] [--all] [--csv FILE_NAME]
 """
-import pandas as pd
+import argparse
+import hashlib
 import json
 import os
 
+import pandas as pd
+
+from ok_mvp.config import PROFILE_SNAPSHOT, PROFILE_SNAPSHOT_DIR
+
+DEFAULT_CSV_FILE_NAME = 'Founder_s_Discovery_Engine_Submissions_2025-08-13.csv'
+ID_COLUMN = 'Submission ID'
+
+# The exact column names from the CSV
+COL_MAP = {
+    'first_name': 'Enter first name',
+    'last_name': 'Last Name',
+    'catalyst': "Think about what's happening in your life, career, or the world right now. Why is this the moment you've chosen to build something new?\n",
+    'mission': "If your business succeeds beyond your wildest dreams, what positive change will exist in the world because of it? This is the core impact you want to make.\n",
+    'purple_cow_insight': "e.g., 'The onboarding process for new software is always so generic and boring,' or 'Local service businesses are terrible at online marketing.",
+    'unfair_advantage': "What is the unique knowledge or skill you've gained from your specific life and career path? This could be a technical skill, a deep industry network, or a lesson learned from a past failure.\n\n",
+    'tribe': "Describe the specific group of people you want to help. Think about their jobs, their challenges, and their goals. The more specific you are, the better. Consider if there's an underserved community whose needs are being ignored.\n\n"
+}
+
+
+def _project_root():
+    # The project root is one level up from the directory where the script is located
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _usecols():
+    return [ID_COLUMN, *COL_MAP.values()]
+
+
+def _columns_key():
+    """Identifies the column mapping a snapshot was built for (a renamed question invalidates it)."""
+    return hashlib.sha256(json.dumps(sorted(_usecols())).encode('utf-8')).hexdigest()[:16]
+
+
+def _read_csv(csv_file_path):
+    """Parse only the ID and mapped columns; the first row wins for a repeated Submission ID."""
+    df = pd.read_csv(csv_file_path, usecols=_usecols(), dtype=str)
+    return df.drop_duplicates(subset=ID_COLUMN, keep='first').set_index(ID_COLUMN)
+
+
+def _load_snapshot(csv_file_path, meta_path):
+    """
+    The snapshot's table if it was built from this exact CSV with the current column mapping,
+    else None, plus the CSV's SHA-256.
+    The file is only hashed when its mtime or size differ from the snapshot's, so a touched but
+    unchanged export still hits the snapshot.
+    """
+    stat = os.stat(csv_file_path)
+    meta = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    if meta and meta.get('mtime') == stat.st_mtime and meta.get('size') == stat.st_size:
+        sha256 = meta['sha256']
+    else:
+        sha256 = _file_sha256(csv_file_path)
+    if not meta or meta.get('sha256') != sha256 or meta.get('columns') != _columns_key():
+        return None, sha256
+
+    snapshot_path = os.path.join(os.path.dirname(meta_path), meta['snapshot'])
+    try:
+        df = pd.read_parquet(snapshot_path)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Warning: could not load the profile snapshot {snapshot_path} ({e}); reading the CSV.")
+        return None, sha256
+    if meta.get('mtime') != stat.st_mtime:
+        _write_snapshot_meta(meta_path, {**meta, 'mtime': stat.st_mtime, 'size': stat.st_size})
+    return df, sha256
+
+
+def _write_snapshot_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def _save_snapshot(df, csv_file_path, meta_path, sha256):
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    snapshot_name = f"{stem}.{sha256[:16]}.{_columns_key()}.parquet"
+    try:
+        df.to_parquet(os.path.join(os.path.dirname(meta_path), snapshot_name))
+    except (ImportError, OSError, ValueError) as e:
+        # No Parquet engine installed (or an unwritable directory): the CSV is parsed every run.
+        print(f"Warning: could not save a profile snapshot ({e}).")
+        return
+    previous = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                previous = json.load(f).get('snapshot')
+        except (OSError, ValueError):
+            previous = None
+    stat = os.stat(csv_file_path)
+    _write_snapshot_meta(meta_path, {'csv': os.path.basename(csv_file_path), 'mtime': stat.st_mtime,
+                                     'size': stat.st_size, 'sha256': sha256, 'columns': _columns_key(),
+                                     'snapshot': snapshot_name})
+    # Only the current snapshot is kept.
+    if previous and previous != snapshot_name:
+        try:
+            os.remove(os.path.join(os.path.dirname(meta_path), previous))
+        except OSError:
+            pass
+
+
+def load_submissions(csv_file_path, snapshot=PROFILE_SNAPSHOT):
+    """
+    The mapped columns of every submission in the CSV, as a DataFrame indexed by Submission ID.
+    With `snapshot`, an up-to-date Parquet snapshot is used instead of the CSV when there is one,
+    and one is written after parsing the CSV.
+    """
+    if not snapshot:
+        return _read_csv(csv_file_path)
+
+    os.makedirs(PROFILE_SNAPSHOT_DIR, exist_ok=True)
+    meta_path = os.path.join(PROFILE_SNAPSHOT_DIR,
+                             f"{os.path.splitext(os.path.basename(csv_file_path))[0]}.snapshot.json")
+    df, sha256 = _load_snapshot(csv_file_path, meta_path)
+    if df is not None:
+        print(f"Loaded {len(df)} submissions from the profile snapshot ({sha256[:12]}).")
+        return df
+    df = _read_csv(csv_file_path)
+    _save_snapshot(df, csv_file_path, meta_path, sha256)
+    return df
+
+
+def _value(profile_series, field):
+    value = profile_series[COL_MAP[field]]
+    return None if pd.isna(value) else value
+
+
+def build_founder_profile(profile_series):
+    """The founder_profile.json content for one submission row."""
+    name_parts = [_value(profile_series, 'first_name'), _value(profile_series, 'last_name')]
+    return {
+        "name": " ".join(part for part in name_parts if part),
+        "catalyst": _value(profile_series, 'catalyst'),
+        "mission": _value(profile_series, 'mission'),
+        "purple_cow_insight": _value(profile_series, 'purple_cow_insight'),
+        "unfair_advantage": _value(profile_series, 'unfair_advantage'),
+        "tribe": _value(profile_series, 'tribe')
+    }
+
+
+def _save_founder_profile(submission_id, founder_profile):
+    # Construct the output directory path within the project's 'output' folder
+    output_dir = os.path.join(_project_root(), 'output', submission_id)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file_path = os.path.join(output_dir, 'founder_profile.json')
+    with open(output_file_path, 'w') as json_file:
+        json.dump(founder_profile, json_file, indent=2)
+    return output_file_path
+
+
+def export_profiles(csv_file_name, submission_ids=None, snapshot=PROFILE_SNAPSHOT):
+    """
+    Save founder_profile.json for `submission_ids` (default: every submission) in one pass over
+    the CSV. Returns {submission_id: founder_profile}; IDs not in the CSV are reported and skipped.
+    """
+    csv_file_path = os.path.join(_project_root(), 'input', csv_file_name)
+    submissions = load_submissions(csv_file_path, snapshot)
+
+    wanted = list(submissions.index) if submission_ids is None else list(dict.fromkeys(submission_ids))
+    profiles = {}
+    for submission_id in wanted:
+        if submission_id not in submissions.index:
+            print(f"Error: Submission ID '{submission_id}' not found in the CSV file.")
+            continue
+        profiles[submission_id] = build_founder_profile(submissions.loc[submission_id])
+        output_file_path = _save_founder_profile(submission_id, profiles[submission_id])
+        print(f"Successfully saved founder profile to: '{output_file_path}'")
+    print(f"Exported {len(profiles)} of {len(wanted)} requested founder profiles.")
+    return profiles
+
+
 def process_submission(submission_id_to_find, csv_file_name):
     """
     Finds a specific submission in a Tally.so CSV export from the 'input' folder,
     transforms it to JSON, and saves it in a new directory inside the 'output' folder.
     """
     try:
-        # Get the directory where the script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        # Get the project root directory (one level up)
-        project_root = os.path.dirname(script_dir)
-
-        # Construct the full path to the input CSV file
-        csv_file_path = os.path.join(project_root, 'input', csv_file_name)
-
-        # Read the CSV file
-        df = pd.read_csv(csv_file_path)
-
-        # Find the row with the matching Submission ID
-        target_row = df[df['Submission ID'] == submission_id_to_find]
-
-        if not target_row.empty:
-            profile_series = target_row.iloc[0]
-
-            # Define the exact column names from the CSV
-            col_map = {
-                'first_name': 'Enter first name',
-                'last_name': 'Last Name',
-                'catalyst': "Think about what's happening in your life, career, or the world right now. Why is this the moment you've chosen to build something new?\n",
-                'mission': "If your business succeeds beyond your wildest dreams, what positive change will exist in the world because of it? This is the core impact you want to make.\n",
-                'purple_cow_insight': "e.g., 'The onboarding process for new software is always so generic and boring,' or 'Local service businesses are terrible at online marketing.",
-                'unfair_advantage': "What is the unique knowledge or skill you've gained from your specific life and career path? This could be a technical skill, a deep industry network, or a lesson learned from a past failure.\n\n",
-                'tribe': "Describe the specific group of people you want to help. Think about their jobs, their challenges, and their goals. The more specific you are, the better. Consider if there's an underserved community whose needs are being ignored.\n\n"
-            }
-
-            # Create the JSON object
-            founder_profile = {
-                "name": f"{profile_series[col_map['first_name']]} {profile_series[col_map['last_name']]}",
-                "catalyst": profile_series[col_map['catalyst']],
-                "mission": profile_series[col_map['mission']],
-                "purple_cow_insight": profile_series[col_map['purple_cow_insight']],
-                "unfair_advantage": profile_series[col_map['unfair_advantage']],
-                "tribe": profile_series[col_map['tribe']]
-            }
-
-            # Construct the output directory path within the project's 'output' folder
-            output_dir = os.path.join(project_root, 'output', submission_id_to_find)
-            os.makedirs(output_dir, exist_ok=True)
-
-            # Define the output file path
-            output_file_path = os.path.join(output_dir, 'founder_profile.json')
-
-            # Save the JSON data to the file
-            with open(output_file_path, 'w') as json_file:
-                json.dump(founder_profile, json_file, indent=2)
-
-            print(f"Successfully created directory: '{output_dir}'")
-            print(f"Successfully saved founder profile to: '{output_file_path}'")
+        founder_profile = export_profiles(csv_file_name, [submission_id_to_find]).get(submission_id_to_find)
+        if founder_profile is not None:
             print("\n--- File Content ---")
             print(json.dumps(founder_profile, indent=2))
-
-        else:
-            print(f"Error: Submission ID '{submission_id_to_find}' not found in the CSV file.")
-
     except FileNotFoundError:
-        print(f"Error: The file '{csv_file_path}' was not found.")
+        print(f"Error: The file '{os.path.join(_project_root(), 'input', csv_file_name)}' was not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Create founder profiles from a Tally.so CSV export.")
+    parser.add_argument("submission_ids", nargs='*', help="Submission IDs to export.")
+    parser.add_argument("--all", action='store_true', help="Export every submission in the CSV.")
+    parser.add_argument("--csv", default=DEFAULT_CSV_FILE_NAME, help="CSV file name in the 'input' folder.")
+    args = parser.parse_args()
+
+    if args.all or len(args.submission_ids) > 1:
+        try:
+            export_profiles(args.csv, None if args.all else args.submission_ids)
+        except FileNotFoundError:
+            print(f"Error: The file '{os.path.join(_project_root(), 'input', args.csv)}' was not found.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+    else:
+        process_submission(args.submission_ids[0] if args.submission_ids else 'ODBbJqp', args.csv)
+
+
 if __name__ == '__main__':
-    # Define the target Submission ID and the name of the input file
-    submission_id = 'ODBbJqp'
-    csv_filename = 'Founder_s_Discovery_Engine_Submissions_2025-08-13.csv'
-    process_submission(submission_id, csv_filename)
\ No newline at end of file
+    main()
@@ -0,0 +1,225 @@
+# ok_mvp/dedupe_utils.py
+"""
+Near-duplicate detection across sources (w-shingling + MinHash + LSH banding).
+
+Sources for one hypothesis often overlap: the same talk on YouTube and as a podcast, or two
+versions of a preprint. Each document or passage is reduced to a MinHash signature over its
+word shingles; LSH buckets only compare candidates that share a band, so the pass stays
+near-linear in corpus size.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+from .config import (
+    DEDUPE_JACCARD_THRESHOLD,
+    DEDUPE_SHINGLE_WORDS,
+    MINHASH_PERMUTATIONS,
+    MINHASH_BANDS,
+)
+from .logger import get_logger
+from .retrieval_utils import split_passages
+
+logger = get_logger()
+
+_WORD_RE = re.compile(r"\w+")
+_MASK32 = (1 << 32) - 1
+_GOLDEN = 0x9E3779B1  # multiplicative mixing so crc32 values spread evenly over the bins
+
+
+def _shingles(text: str, k: int = DEDUPE_SHINGLE_WORDS) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + k]).encode()) for i in range(len(words) - k + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """
+    One-permutation MinHash signature of a text's word shingles.
+
+    Each shingle hash lands in one of MINHASH_PERMUTATIONS bins and only the bin minimum is
+    kept, so a signature costs one pass over the shingles instead of one pass per
+    permutation. Empty bins are filled by rotation densification.
+
+    Args:
+        text: Any text.
+
+    Returns:
+        MINHASH_PERMUTATIONS values (empty for text without words).
+    """
+    hashes = _shingles(text)
+    if not hashes:
+        return []
+    bins = MINHASH_PERMUTATIONS
+    empty = 1 << 32
+    signature = [empty] * bins
+    for h in hashes:
+        mixed = (h * _GOLDEN) & _MASK32
+        slot, value = mixed % bins, mixed // bins
+        if value < signature[slot]:
+            signature[slot] = value
+    if empty in signature:
+        for i in range(bins):
+            if signature[i] == empty:
+                # Borrow the next non-empty bin to the right, offset by the distance travelled.
+                for step in range(1, bins):
+                    donor = signature[(i + step) % bins]
+                    if donor < empty:
+                        signature[i] = donor + step * (empty // bins)
+                        break
+    return signature
+
+
+def estimated_jaccard(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """Fraction of agreeing signature slots, an unbiased estimate of Jaccard similarity."""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; `query` only returns items sharing at least one band."""
+
+    def __init__(self, bands: int = MINHASH_BANDS):
+        self.bands = bands
+        self.rows = max(1, MINHASH_PERMUTATIONS // bands)
+        self._buckets: Dict[tuple, List[int]] = defaultdict(list)
+        self._signatures: Dict[int, List[int]] = {}
+
+    def _keys(self, signature: Sequence[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: int, signature: List[int]) -> None:
+        self._signatures[key] = signature
+        for bucket in self._keys(signature):
+            self._buckets[bucket].append(key)
+
+    def query(self, signature: List[int], threshold: float = DEDUPE_JACCARD_THRESHOLD) -> List[int]:
+        """Keys of indexed items whose estimated Jaccard with `signature` is >= threshold."""
+        candidates = {key for bucket in self._keys(signature) for key in self._buckets.get(bucket, ())}
+        return [key for key in candidates
+                if estimated_jaccard(signature, self._signatures[key]) >= threshold]
+
+
+def find_duplicate_documents(texts: Sequence[str], threshold: float = DEDUPE_JACCARD_THRESHOLD) -> Dict[int, int]:
+    """
+    Find documents that are near-duplicates of another document.
+
+    Args:
+        texts: Source texts, positionally aligned with `source_evidence`.
+        threshold: Minimum estimated Jaccard similarity of word shingles.
+
+    Returns:
+        {duplicate_index: representative_index}. The representative of a group is its
+        longest member, so the richest copy is the one kept for synthesis.
+    """
+    signatures = [minhash(text) if text else [] for text in texts]
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    index = LSHIndex()
+    for i, signature in enumerate(signatures):
+        if not signature:
+            continue
+        for j in index.query(signature, threshold):
+            parent[find(i)] = find(j)
+        index.add(i, signature)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i, signature in enumerate(signatures):
+        if signature:
+            groups[find(i)].append(i)
+    duplicates = {}
+    for members in groups.values():
+        representative = max(members, key=lambda i: (len(texts[i]), -i))
+        duplicates.update({i: representative for i in members if i != representative})
+    return duplicates
+
+
+def drop_duplicate_passages(texts: Sequence[str], threshold: float = DEDUPE_JACCARD_THRESHOLD) -> List[str]:
+    """
+    Remove passages that near-duplicate a passage seen earlier in the corpus (in any source).
+
+    Args:
+        texts: Source texts, positionally aligned with `source_evidence`.
+        threshold: Minimum estimated Jaccard similarity of word shingles.
+
+    Returns:
+        The texts with repeated passages removed (unchanged texts are returned as-is).
+    """
+    index = LSHIndex()
+    out: List[str] = []
+    dropped = 0
+    for i, text in enumerate(texts):
+        if not text:
+            out.append(text)
+            continue
+        kept, removed_here = [], 0
+        for passage in split_passages(text, i):
+            piece = passage.text(texts)
+            signature = minhash(piece)
+            if signature and index.query(signature, threshold):
+                removed_here += 1
+                continue
+            if signature:
+                index.add(len(index), signature)
+            kept.append(piece)
+        dropped += removed_here
+        out.append("\n\n".join(kept) if removed_here else text)
+    if dropped:
+        logger.info(f"[Dedupe] Dropped {dropped} near-duplicate passages across {len(texts)} sources.")
+    return out
+
+
+def collapse_near_duplicates(source_evidence: List[dict], contents: List[str],
+                             threshold: float = DEDUPE_JACCARD_THRESHOLD) -> List[str]:
+    """
+    Collapse near-duplicate sources and passages ahead of the LLM calls.
+
+    Duplicate documents keep their `source_evidence` entry (so every URL is still listed),
+    marked with `duplicate_of` pointing at the copy that was kept, and their text is
+    blanked. Passages repeated across the remaining sources are then dropped.
+
+    Args:
+        source_evidence: Evidence entries, positionally aligned with `contents`; updated in place.
+        contents: Source texts.
+        threshold: Minimum estimated Jaccard similarity of word shingles.
+
+    Returns:
+        The contents to synthesize from, still aligned with `source_evidence`.
+    """
+    duplicates = find_duplicate_documents(contents, threshold)
+    for duplicate, representative in duplicates.items():
+        source_evidence[duplicate]["duplicate_of"] = representative
+    if duplicates:
+        logger.info(f"[Dedupe] Collapsed {len(duplicates)} near-duplicate sources into their longest copy.")
+    contents = ["" if i in duplicates else text for i, text in enumerate(contents)]
+    return drop_duplicate_passages(contents, threshold)
+
+
+def expand_evidence_indices(opportunities: List[dict], source_evidence: List[dict]) -> None:
+    """Add the indices of collapsed duplicates wherever their kept copy is cited (in place)."""
+    copies: Dict[int, List[int]] = defaultdict(list)
+    for i, source in enumerate(source_evidence):
+        if "duplicate_of" in source:
+            copies[source["duplicate_of"]].append(i)
+    if not copies:
+        return
+    for opportunity in opportunities:
+        cited = opportunity.get("supporting_evidence_indices")
+        if isinstance(cited, list):
+            extra = [j for i in cited if isinstance(i, int) for j in copies.get(i, ()) if j not in cited]
+            opportunity["supporting_evidence_indices"] = cited + sorted(set(extra))
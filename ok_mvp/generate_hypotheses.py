@@ -5,44 +5,67 @@ the result as hypotheses.json in the same submission folder.
 """
 import json
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
 
-def get_prompt_text(founder_profile_content):
-    """Constructs the full prompt with embedded founder profile data."""
-    
-    # This is the detailed prompt we designed earlier.
-    prompt = f"""
+from ok_mvp.concurrency_utils import chat_completion
+from ok_mvp.config import LLM_STREAM_JSON
+from ok_mvp.llm_backend_utils import backend_needs_api_key, get_llm_client
+from ok_mvp.prompt_utils import build_messages, register_prompt
+from ok_mvp.stream_utils import parse_json_response, stream_chat_json
+from ok_mvp.usage_utils import llm_usage, write_usage_report
+
+# Static instructions first and the founder profile after them, so calls share a cacheable prefix.
+HYPOTHESES_PROMPT = register_prompt("hypotheses", 1, """
+You are an expert business strategist. Return only valid JSON arrays with no additional text.
+
 # ROLE
 You are an expert business strategist and startup incubator analyst. Your specialty is identifying high-potential, niche business opportunities based on a founder's unique profile and "earned secrets." You excel at translating personal insights and frustrations into concrete, viable business concepts.
 
 # TASK
-Analyze the following founder profile and generate three distinct, specific, and viable 'Opportunity Hypotheses.' These hypotheses will be used to guide deep research into market trends, existing solutions, and technical feasibility.
+Analyze the founder profile given by the user and generate three distinct, specific, and viable 'Opportunity Hypotheses.' These hypotheses will be used to guide deep research into market trends, existing solutions, and technical feasibility.
 
 # CONTEXT
 The founder profile data is gathered from a multi-step intake form designed to uncover the founder's core motivations and unique perspective.
 
 # INSTRUCTIONS
-1. Carefully analyze the provided `## FOUNDER PROFILE DATA`.
+1. Carefully analyze the provided `# FOUNDER PROFILE DATA`.
 2. Generate three **distinct** hypotheses. Consider different business models for each (e.g., a niche SaaS tool, a tech-enabled service, a data product).
 3. For each hypothesis, use the following framework as a guide:
     > "For **[Tribe]**, who are frustrated by **[Purple Cow Insight]**, we can build a **[Product/Service]** that uses **[Unfair Advantage/Technology]** to deliver **[Key Delight/Value Prop]**."
 4. Return ONLY a valid JSON array with exactly 3 objects. No explanatory text, no markdown formatting, no additional content.
 
-# FOUNDER PROFILE DATA
-{json.dumps(founder_profile_content, indent=2)}
-
 You must respond with a JSON array containing exactly 3 hypothesis objects. Each object must have these exact fields:
 - hypothesis_name (string)
-- hypothesis_description (string) 
+- hypothesis_description (string)
 - business_model (string)
 - target_customer (string)
-"""
-    return prompt
+""")
+
+def get_prompt_text(founder_profile_content):
+    """The per-submission part of the prompt: the founder profile data."""
+    return f"# FOUNDER PROFILE DATA\n{json.dumps(founder_profile_content, indent=2)}"
+
+def build_request(founder_profile):
+    """Chat completion arguments (model, messages) for a founder profile."""
+    return dict(
+        model="gpt-5-mini",
+        messages=build_messages(HYPOTHESES_PROMPT, context=get_prompt_text(founder_profile)),
+    )
+
+def coerce_hypotheses(hypotheses_data):
+    """Ensure the parsed response is a list of hypotheses (unwrap {"hypotheses": [...]} style answers)."""
+    if isinstance(hypotheses_data, dict):
+        hypotheses_data = next((v for v in hypotheses_data.values() if isinstance(v, list)), hypotheses_data)
+    if not isinstance(hypotheses_data, list):
+        raise ValueError("Response should be a JSON array")
+    return hypotheses_data
 
-def generate_hypotheses(submission_id):
+def generate_hypotheses(submission_id, on_hypothesis=None):
     """
     Main function to generate hypotheses for a given submission ID.
+
+    With LLM_STREAM_JSON the response is streamed, and `on_hypothesis` (if given) is called
+    with each hypothesis as soon as it is complete, before the model has finished the rest.
     """
     try:
         # --- 1. Define Paths ---
@@ -61,43 +84,32 @@ def generate_hypotheses(submission_id):
         print(f"Loading API key from: {dotenv_path}")
         load_dotenv(dotenv_path=dotenv_path)
         api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
+        if not api_key and backend_needs_api_key():
             raise ValueError("OPENAI_API_KEY not found in .env file")
 
         # --- 3. Call AI ---
-        client = OpenAI(api_key=api_key)
-        prompt = get_prompt_text(founder_profile)
+        client = get_llm_client(api_key)  # LLM_BACKEND: the API or an offline stand-in
 
         print("Sending request to OpenAI API...")
-        response = client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert business strategist. Return only valid JSON arrays with no additional text."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        response_content = response.choices[0].message.content
-        print("Received response from API.")
-        print(f"Raw response content: {response_content[:500]}...")  # Debug output
-        
+        request = build_request(founder_profile)
+
         # --- 4. Save Output ---
-        # The API is instructed to return a JSON object, so we parse the string.
-        # Sometimes the response might include markdown ```json ... ``` tags, so we clean it.
-        if "```json" in response_content:
-            json_string = response_content.split("```json\n")[1].split("\n```")[0]
-        else:
-            json_string = response_content
-            
-        try:
-            hypotheses_data = json.loads(json_string)
-            # Ensure it's a list of hypotheses
-            if not isinstance(hypotheses_data, list):
-                raise ValueError("Response should be a JSON array")
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(f"Attempted to parse: {json_string}")
-            raise
+        # The API is instructed to return a JSON array; parse_json_response also copes with
+        # markdown ```json fences, surrounding text and a truncated tail.
+        with llm_usage("hypotheses", submission_id):
+            try:
+                if LLM_STREAM_JSON:
+                    hypotheses_data = stream_chat_json(client, None, on_hypothesis, **request)
+                    print("Received streamed response from API.")
+                else:
+                    response_content = chat_completion(client, **request).choices[0].message.content
+                    print("Received response from API.")
+                    print(f"Raw response content: {response_content[:500]}...")  # Debug output
+                    hypotheses_data = parse_json_response(response_content)
+                hypotheses_data = coerce_hypotheses(hypotheses_data)
+            except json.JSONDecodeError as e:
+                print(f"JSON decode error: {e}")
+                raise
 
         print(f"Saving hypotheses to: {hypotheses_path}")
         with open(hypotheses_path, 'w') as f:
@@ -113,6 +125,8 @@ def generate_hypotheses(submission_id):
         print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        write_usage_report(submission_id, submission_dir)
 
 if __name__ == '__main__':
     # Define the target Submission ID for this run
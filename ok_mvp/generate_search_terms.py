@@ -1,29 +1,37 @@
 """
-Loads the hypotheses.json file for a specific submission, loops through
-each hypothesis, and calls an LLM to generate a list of search terms
-for each one. Saves each list of terms to a separate JSON file.
+Loads the hypotheses.json file for a specific submission and calls an LLM to
+generate a list of search terms for each hypothesis (concurrently, or in one
+batched request). Saves each list of terms to a separate JSON file.
 """
 import json
 import os
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-def get_prompt_text(hypothesis_object):
-    """Constructs the full prompt with an embedded hypothesis object."""
-    
-    # This is the detailed prompt we designed for search term derivation.
-    prompt = f"""
+from ok_mvp.concurrency_utils import chat_completion
+from ok_mvp.config import LLM_STREAM_JSON, SEARCH_TERM_CLUSTERING, SEARCH_TERMS_MODE
+from ok_mvp.llm_backend_utils import backend_needs_api_key, get_llm_client
+from ok_mvp.prompt_utils import build_messages, register_prompt
+from ok_mvp.stream_utils import parse_json_response, stream_chat_json
+from ok_mvp.term_utils import cluster_search_terms
+from ok_mvp.usage_utils import llm_usage, write_usage_report
+
+# Static instructions first and the hypothesis after them, so calls share a cacheable prefix.
+SEARCH_TERMS_PROMPT = register_prompt("search_terms", 1, """
+You are an expert market researcher. Return only valid JSON objects with no additional text.
+
 # ROLE
 You are an expert market researcher and data strategist. Your skill is deconstructing a business concept into a comprehensive set of search queries designed to uncover technical documentation, market analysis, and competitor intelligence.
 
 # TASK
-Analyze the following 'Opportunity Hypothesis' and generate a diverse list of search terms. These terms will be used to find relevant podcasts, academic papers, and articles to validate the business idea.
+Analyze the 'Opportunity Hypothesis' given by the user and generate a diverse list of search terms. These terms will be used to find relevant podcasts, academic papers, and articles to validate the business idea.
 
 # CONTEXT
 The search terms should cover multiple facets of the hypothesis to ensure a well-rounded research output. The goal is to gather information on the 'how' (technical), the 'why' (strategy), the 'who' (market), and the 'what else' (competitors).
 
 # INSTRUCTIONS
-1. Carefully analyze the provided `## OPPORTUNITY HYPOTHESIS`.
+1. Carefully analyze the provided `# OPPORTUNITY HYPOTHESIS`.
 2. Generate a list of at least 10-15 distinct search terms.
 3. Ensure the list includes a mix of the following categories:
     * Technical/Implementation Terms: Specific APIs, algorithms, or technologies needed to build the product.
@@ -32,17 +40,118 @@ The search terms should cover multiple facets of the hypothesis to ensure a well
     * Competitor Terms: Queries designed to find existing players or alternative solutions.
 4. Return ONLY a valid JSON object with a "search_terms" array. No explanatory text, no markdown formatting, no additional content.
 
-# OPPORTUNITY HYPOTHESIS
-{json.dumps(hypothesis_object, indent=2)}
-
 You must respond with a JSON object containing a "search_terms" array with 10-15 search term strings.
-"""
-    return prompt
+""")
+
+def get_prompt_text(hypothesis_object):
+    """The per-hypothesis part of the prompt: the hypothesis object."""
+    return f"# OPPORTUNITY HYPOTHESIS\n{json.dumps(hypothesis_object, indent=2)}"
+
+def build_request(hypothesis_object):
+    """Chat completion arguments (model, messages) for one hypothesis."""
+    return dict(
+        model="gpt-5-mini",
+        messages=build_messages(SEARCH_TERMS_PROMPT, context=get_prompt_text(hypothesis_object)),
+    )
+
+def validate_search_terms(search_terms_data):
+    """Ensure the parsed response has the expected {"search_terms": [...]} structure."""
+    if not isinstance(search_terms_data, dict) or not isinstance(search_terms_data.get("search_terms"), list):
+        raise ValueError("Response should contain a 'search_terms' array")
+
+# One request for all hypotheses at once (SEARCH_TERMS_MODE=batched): the same instructions, applied
+# to each numbered hypothesis, answered as one object per hypothesis.
+SEARCH_TERMS_BATCH_PROMPT = register_prompt("search_terms_batch", 1, SEARCH_TERMS_PROMPT.instructions + """
+
+# MULTIPLE HYPOTHESES
+The user gives several numbered hypotheses (`# OPPORTUNITY HYPOTHESIS n`). Apply the instructions to each
+one separately. Respond with a JSON object containing a "search_terms_by_hypothesis" array with one object
+per hypothesis, in order, each with "hypothesis_number" (integer) and its own "search_terms" array.
+""")
+
+def build_batch_request(hypotheses):
+    """Chat completion arguments for one request covering all `hypotheses` (numbered from 1)."""
+    context = "\n\n".join(f"# OPPORTUNITY HYPOTHESIS {num}\n{json.dumps(hypothesis, indent=2)}"
+                           for num, hypothesis in enumerate(hypotheses, 1))
+    return dict(
+        model="gpt-5-mini",
+        messages=build_messages(SEARCH_TERMS_BATCH_PROMPT, context=context),
+        response_format={"type": "json_object"},
+    )
 
-def generate_terms_for_hypotheses(submission_id):
+def finalize_search_terms(search_terms_data):
+    """The terms as saved: near-synonyms collapsed into one query each (SEARCH_TERM_CLUSTERING)."""
+    return cluster_search_terms(search_terms_data) if SEARCH_TERM_CLUSTERING else search_terms_data
+
+SEARCH_TERMS_MODES = ("concurrent", "batched", "sequential")
+
+def _write_json_atomic(path, data):
+    """Write JSON via a temporary file and a rename, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _terms_for_hypothesis(client, submission_id, num, hypothesis, on_term=None):
+    """Search terms for hypothesis `num` (one LLM call); returns the validated {"search_terms": [...]}."""
+    request = build_request(hypothesis)
+    with llm_usage("search_terms", submission_id):
+        if LLM_STREAM_JSON:
+            on_item = (lambda term: on_term(num, term)) if on_term else None
+            search_terms_data = stream_chat_json(client, "search_terms", on_item, **request)
+        else:
+            response_content = chat_completion(client, **request).choices[0].message.content
+            search_terms_data = parse_json_response(response_content)
+    validate_search_terms(search_terms_data)
+    return search_terms_data
+
+def _terms_batched(client, submission_id, hypotheses, on_term=None):
+    """
+    All hypotheses' search terms from one request: {num: {"search_terms": [...]}}. Hypotheses
+    the answer leaves out (or gets wrong) are missing from the result.
+    """
+    results = {}
+
+    def accept(item):
+        num = item.get("hypothesis_number") if isinstance(item, dict) else None
+        if not isinstance(num, int) or not 1 <= num <= len(hypotheses) or num in results:
+            return
+        try:
+            validate_search_terms(item)
+        except ValueError:
+            return
+        results[num] = {"search_terms": item["search_terms"]}
+        if on_term:
+            for term in item["search_terms"]:
+                on_term(num, term)
+
+    request = build_batch_request(hypotheses)
+    with llm_usage("search_terms", submission_id):
+        if LLM_STREAM_JSON:
+            data = stream_chat_json(client, "search_terms_by_hypothesis", accept, **request)
+        else:
+            data = parse_json_response(chat_completion(client, **request).choices[0].message.content)
+    for item in (data.get("search_terms_by_hypothesis") or []) if isinstance(data, dict) else []:
+        accept(item)
+    return results
+
+def generate_terms_for_hypotheses(submission_id, on_term=None, mode=SEARCH_TERMS_MODE):
     """
     Main function to generate search terms for all hypotheses of a given submission ID.
+
+    `mode` (default SEARCH_TERMS_MODE) is "concurrent" (one request per hypothesis, all in
+    flight at once within the LLM limiter), "batched" (one request for all hypotheses; any it
+    misses are then requested individually) or "sequential". Files are written atomically once
+    every request has finished, so the stage's wall time no longer grows with the number of
+    hypotheses.
+
+    With LLM_STREAM_JSON the responses are streamed, and `on_term(hypothesis_num, term)` (if
+    given) is called for each term as soon as it is complete, e.g. to start the source
+    searches for the first term while the model is still writing the rest. In concurrent mode
+    it is called from worker threads.
     """
+    if mode not in SEARCH_TERMS_MODES:
+        raise ValueError(f"Unknown search terms mode '{mode}' (expected one of {', '.join(SEARCH_TERMS_MODES)})")
     try:
         # --- 1. Define Paths ---
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -59,52 +168,57 @@ def generate_terms_for_hypotheses(submission_id):
         print(f"Loading API key from: {dotenv_path}")
         load_dotenv(dotenv_path=dotenv_path)
         api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
+        if not api_key and backend_needs_api_key():
             raise ValueError("OPENAI_API_KEY not found in .env file")
         
-        client = OpenAI(api_key=api_key)
+        client = get_llm_client(api_key)  # LLM_BACKEND: the API or an offline stand-in
 
-        # --- 3. Loop Through Hypotheses and Call AI ---
+        # --- 3. Call AI for all hypotheses ---
         for i, hypothesis in enumerate(hypotheses):
-            hypothesis_name = hypothesis.get("hypothesis_name", f"Hypothesis_{i+1}")
-            print(f"\n--- Generating search terms for: '{hypothesis_name}' ---")
-            
-            prompt = get_prompt_text(hypothesis)
-
-            print("Sending request to OpenAI API...")
-            response = client.chat.completions.create(
-                model="gpt-5-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert market researcher. Return only valid JSON objects with no additional text."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            
-            response_content = response.choices[0].message.content
-            print("Received response from API.")
-            print(f"Raw response content: {response_content[:200]}...")  # Debug output
-            
-            # --- 4. Save Output ---
+            print(f"--- Generating search terms for: '{hypothesis.get('hypothesis_name', f'Hypothesis_{i+1}')}' ---")
+        print(f"Sending {mode} search term requests to OpenAI API...")
+        started = time.perf_counter()
+        results, errors = {}, {}
+        pending = list(range(1, len(hypotheses) + 1))
+        if mode == "batched" and pending:
             try:
-                search_terms_data = json.loads(response_content)
-                # Ensure it has the expected structure
-                if not isinstance(search_terms_data.get("search_terms"), list):
-                    raise ValueError("Response should contain a 'search_terms' array")
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error: {e}")
-                print(f"Attempted to parse: {response_content}")
-                raise
-            
-            # Sanitize hypothesis name for use in filename
-            filename_safe_name = f"hypothesis_{i+1}_search_terms.json"
-            output_path = os.path.join(submission_dir, filename_safe_name)
+                results = _terms_batched(client, submission_id, hypotheses, on_term)
+            except Exception as e:
+                # Includes API errors that outlast the limiter's retries, not just unparseable answers.
+                print(f"Batched request failed ({e}); requesting each hypothesis separately.")
+            else:
+                pending = [num for num in pending if num not in results]
+                if pending:
+                    print(f"Batched answer missed hypotheses {pending}; requesting them separately.")
+        if mode == "sequential":
+            for num in pending:
+                try:
+                    results[num] = _terms_for_hypothesis(client, submission_id, num, hypotheses[num - 1], on_term)
+                except Exception as e:
+                    errors[num] = e
+        elif pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = {num: executor.submit(_terms_for_hypothesis, client, submission_id, num,
+                                                hypotheses[num - 1], on_term) for num in pending}
+                for num, future in futures.items():
+                    try:
+                        results[num] = future.result()
+                    except Exception as e:
+                        errors[num] = e
+        print(f"Received search terms for {len(results)} of {len(hypotheses)} hypotheses "
+              f"in {time.perf_counter() - started:.1f}s ({mode}).")
 
+        # --- 4. Save Output ---
+        for num, search_terms_data in sorted(results.items()):
+            output_path = os.path.join(submission_dir, f"hypothesis_{num}_search_terms.json")
             print(f"Saving search terms to: {output_path}")
-            with open(output_path, 'w') as f:
-                json.dump(search_terms_data, f, indent=2)
-            
-            print(f"Successfully generated and saved {len(search_terms_data.get('search_terms', []))} search terms for Hypothesis {i+1}.")
-            print(f"Generated {len(search_terms_data.get('search_terms', []))} search terms.")
+            search_terms_data = finalize_search_terms(search_terms_data)
+            _write_json_atomic(output_path, search_terms_data)
+            generated = search_terms_data.get('original_search_terms', search_terms_data.get('search_terms', []))
+            print(f"Generated {len(generated)} search terms for Hypothesis {num} "
+                  f"({len(search_terms_data.get('search_terms', []))} distinct queries).")
+        for num, e in sorted(errors.items()):
+            print(f"Error: search terms for Hypothesis {num} failed: {e}")
 
     except FileNotFoundError as e:
         print(f"Error: Could not find a required file. {e}")
@@ -112,6 +226,8 @@ def generate_terms_for_hypotheses(submission_id):
         print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        write_usage_report(submission_id, submission_dir)
 
 if __name__ == '__main__':
     # Define the target Submission ID for this run
@@ -0,0 +1,180 @@
+# ok_mvp/http_utils.py
+"""
+Process-wide pooled HTTP layer shared by the source modules.
+
+Connections are kept alive per host so repeated caption, PDF and GraphQL downloads
+skip the TCP/TLS handshake. When `httpx` with HTTP/2 support is installed (the "http2"
+extra) the layer uses it (and negotiates HTTP/2 where the server supports it); otherwise
+it falls back to a `requests.Session` with a sized connection pool.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Optional, Tuple
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_ENABLE_HTTP2,
+    HTTP2_MAX_CONNECTIONS,
+    HTTP2_MAX_KEEPALIVE,
+)
+from .logger import get_logger
+
+logger = get_logger()
+
+# Optional HTTP/2 client (httpx + h2, the "http2" extra); not a hard dependency of the project.
+try:
+    import httpx  # noqa: F401
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except Exception:
+    _HTTP2_AVAILABLE = False
+
+_USE_HTTP2 = HTTP_ENABLE_HTTP2 and _HTTP2_AVAILABLE
+
+_client: Any = None
+_client_lock = threading.Lock()
+
+# aiohttp sessions are bound to an event loop, so keep one per loop.
+_async_sessions: dict = {}
+
+
+def _build_client() -> Any:
+    """Create the shared client: httpx with HTTP/2 if available, else a pooled requests.Session."""
+    if _USE_HTTP2:
+        import httpx
+        logger.info("[HTTP] Using shared httpx client with HTTP/2 enabled.")
+        return httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            # httpx limits are totals across hosts, not per-host pools like HTTP_POOL_MAXSIZE.
+            limits=httpx.Limits(
+                max_connections=HTTP2_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP2_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_client() -> Any:
+    """
+    Return the process-wide HTTP client, creating it on first use.
+
+    Returns:
+        An `httpx.Client` (HTTP/2) or a `requests.Session`; both expose the same
+        `get`/`post` calls and response attributes used by this package.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def _request(method: str, url: str, timeout: Optional[float], kwargs: dict) -> Any:
+    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    elif not _USE_HTTP2:
+        # httpx carries its own default timeout; requests needs it per call.
+        kwargs["timeout"] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return getattr(get_client(), method)(url, **kwargs)
+
+
+def http_get(url: str, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    GET a URL through the shared connection pool and raise on HTTP errors.
+
+    Args:
+        url: The URL to fetch.
+        timeout: Optional timeout in seconds; defaults to the configured connect/read timeouts.
+
+    Returns:
+        The response object (`.text`, `.content`, `.json()`, `.status_code`).
+    """
+    resp = _request("get", url, timeout, kwargs)
+    resp.raise_for_status()
+    return resp
+
+
+def http_post(url: str, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+    """
+    POST to a URL through the shared connection pool. The caller inspects the status code.
+
+    Args:
+        url: The URL to post to.
+        timeout: Optional timeout in seconds; defaults to the configured connect/read timeouts.
+
+    Returns:
+        The response object (`.text`, `.content`, `.json()`, `.status_code`, `.headers`).
+    """
+    return _request("post", url, timeout, kwargs)
+
+
+def close_client() -> None:
+    """Close the shared client and its pooled connections (e.g. at the end of a run)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            try:
+                _client.close()
+            except Exception as e:
+                logger.warning(f"[HTTP] Failed to close shared client: {e}")
+            _client = None
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """
+    Return the pooled aiohttp session for the running event loop, creating it on first use.
+
+    Used where a request must not occupy a worker thread (e.g. long-running status polls).
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                                         limit_per_host=HTTP_POOL_MAXSIZE)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=HTTP_CONNECT_TIMEOUT,
+                                        sock_read=HTTP_READ_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _async_sessions[loop] = session
+    return session
+
+
+async def async_http_post(url: str, timeout: Optional[float] = None, **kwargs: Any) -> Tuple[int, dict, str]:
+    """
+    POST to a URL through the loop's pooled aiohttp session without blocking a thread.
+
+    Args:
+        url: The URL to post to.
+        timeout: Optional total timeout in seconds.
+
+    Returns:
+        A (status, headers, body_text) tuple; the caller inspects the status code.
+    """
+    if timeout is not None:
+        kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+    async with get_async_session().post(url, **kwargs) as resp:
+        return resp.status, dict(resp.headers), await resp.text()
+
+
+async def close_async_session() -> None:
+    """Close the aiohttp session belonging to the running event loop, if any."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
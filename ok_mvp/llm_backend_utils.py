@@ -0,0 +1,246 @@
+# ok_mvp/llm_backend_utils.py
+"""
+Pluggable LLM backends (LLM_BACKEND), all shaped like the OpenAI client's `chat.completions.create`.
+
+  - "openai": the real API;
+  - "local":  `LocalChatClient`, a deterministic stand-in with a latency distribution, error
+              rate and token throughput, answering with schema-valid canned JSON;
+  - "record": the real API, with every request and answer appended to LLM_RECORDING_PATH;
+  - "replay": `ReplayChatClient`, answering from that recording (optionally with its timing).
+
+So every stage can be profiled and load-tested, or replayed exactly, on a machine with no key and
+no network. Responses carry `usage` and stream chunks carry `delta.content`, as the SDK's do.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, Optional
+
+from .batch_utils import canned_response
+from .chunk_utils import get_token_counter
+from .config import (
+    LLM_BACKEND, LLM_RECORDING_PATH, LLM_REPLAY_TIMING, LLM_STANDIN_ERROR_RATE, LLM_STANDIN_LATENCY_MEDIAN,
+    LLM_STANDIN_LATENCY_SIGMA, LLM_STANDIN_SEED, LLM_STANDIN_TOKENS_PER_SECOND,
+)
+from .logger import get_logger
+from .prompt_utils import PROVIDER_CACHE_MIN_TOKENS
+
+logger = get_logger()
+
+BACKENDS = ("openai", "local", "record", "replay")
+_STREAM_CHUNK_TOKENS = 8  # tokens per simulated stream chunk
+
+
+class SimulatedAPIError(Exception):
+    """An API error raised by a stand-in, shaped like the SDK's (status_code, response.headers)."""
+
+    def __init__(self, status_code: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def request_key(request: dict) -> str:
+    """Stable key of a chat request: everything that shapes the answer (not `stream`)."""
+    shaped = {k: v for k, v in request.items() if k not in ("stream", "stream_options")}
+    return hashlib.sha256(json.dumps(shaped, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _prompt_text(request: dict) -> str:
+    return "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+
+
+def _usage(request: dict, content: str, cached: int = 0) -> SimpleNamespace:
+    count = get_token_counter()
+    prompt = sum(count(str(m.get("content", ""))) for m in request.get("messages", []))
+    completion = count(content)
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion,
+                           prompt_tokens_details=SimpleNamespace(cached_tokens=min(cached, prompt)))
+
+
+def _response(request: dict, content: str, cached: int = 0) -> SimpleNamespace:
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(model=request.get("model"), choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                           usage=_usage(request, content, cached))
+
+
+def _stream(request: dict, content: str, ttft: float, chunk_delay: Callable[[str], float],
+            cached: int = 0) -> Iterator:
+    """Stream chunks of `content` after `ttft` seconds; the last chunk carries usage, like include_usage."""
+    time.sleep(ttft)
+    step = _STREAM_CHUNK_TOKENS * 4
+    for start in range(0, len(content), step):
+        piece = content[start:start + step]
+        time.sleep(chunk_delay(piece))
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+    yield SimpleNamespace(choices=[], usage=_usage(request, content, cached))
+
+
+class _Chat:
+    def __init__(self, create: Callable):
+        self.completions = SimpleNamespace(create=create)
+
+
+class LocalChatClient:
+    """
+    Deterministic stand-in for the chat API.
+
+    Each call waits a log-normal time to first token (median `latency_median`, shape `sigma`), then
+    produces the answer at `tokens_per_second`. With probability `error_rate` it fails instead, with
+    a 429 (with Retry-After) or a 500. The draws are seeded from `seed`, the request and how often
+    that request was seen, so a run is reproducible whatever the thread interleaving.
+
+    Prompt caching is mimicked too: the longest prefix shared with an earlier prompt is reported
+    as cached tokens once it reaches the provider's minimum, in 128-token steps.
+    """
+
+    def __init__(self, responder: Callable[[dict], str] = canned_response,
+                 latency_median: float = LLM_STANDIN_LATENCY_MEDIAN, sigma: float = LLM_STANDIN_LATENCY_SIGMA,
+                 error_rate: float = LLM_STANDIN_ERROR_RATE, tokens_per_second: float = LLM_STANDIN_TOKENS_PER_SECOND,
+                 seed: int = LLM_STANDIN_SEED):
+        self.responder = responder
+        self.latency_median = latency_median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self.seed = seed
+        self._attempts: Dict[str, int] = {}
+        self._seen_prompts: deque = deque(maxlen=256)
+        self._lock = threading.Lock()
+        self.chat = _Chat(self._create)
+
+    def _cached_tokens(self, request: dict) -> int:
+        text = _prompt_text(request)
+        with self._lock:
+            shared = max((len(os.path.commonprefix([text, seen])) for seen in self._seen_prompts), default=0)
+            self._seen_prompts.append(text)
+        tokens = get_token_counter()(text[:shared]) if shared else 0
+        return tokens // 128 * 128 if tokens >= PROVIDER_CACHE_MIN_TOKENS else 0
+
+    def _rng(self, key: str) -> random.Random:
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        return random.Random(f"{self.seed}|{key}|{attempt}")
+
+    def _create(self, stream: bool = False, **request):
+        rng = self._rng(request_key(request))
+        ttft = rng.lognormvariate(math.log(self.latency_median), self.sigma) if self.latency_median > 0 else 0.0
+        if rng.random() < self.error_rate:
+            time.sleep(ttft / 2)
+            if rng.random() < 2 / 3:
+                raise SimulatedAPIError(429, "Rate limit reached (simulated).", {"retry-after": "1"})
+            raise SimulatedAPIError(500, "Internal server error (simulated).")
+        content = self.responder(request)
+        cached = self._cached_tokens(request)
+        count = get_token_counter()
+        per_token = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        if stream:
+            return _stream(request, content, ttft, lambda piece: count(piece) * per_token, cached)
+        time.sleep(ttft + count(content) * per_token)
+        return _response(request, content, cached)
+
+
+_recording_lock = threading.Lock()
+
+
+class RecordingChatClient:
+    """Pass-through to a real client that appends each request and answer to a JSONL recording."""
+
+    def __init__(self, client, path: str = LLM_RECORDING_PATH):
+        self.client = client
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.chat = _Chat(self._create)
+
+    def _record(self, request: dict, content: str, started: float, ttft: Optional[float]) -> None:
+        row = {"key": request_key(request), "model": request.get("model"), "content": content,
+               "seconds": round(time.perf_counter() - started, 3),
+               "ttft": round(ttft, 3) if ttft is not None else None}
+        with _recording_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row) + "\n")
+
+    def _create(self, stream: bool = False, **request):
+        started = time.perf_counter()
+        if not stream:
+            response = self.client.chat.completions.create(**request)
+            self._record(request, response.choices[0].message.content or "", started, None)
+            return response
+        return self._recorded_stream(request, started)
+
+    def _recorded_stream(self, request: dict, started: float) -> Iterator:
+        parts, ttft = [], None
+        for chunk in self.client.chat.completions.create(stream=True, **request):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                ttft = ttft if ttft is not None else time.perf_counter() - started
+                parts.append(delta)
+            yield chunk
+        self._record(request, "".join(parts), started, ttft)
+
+
+class ReplayChatClient:
+    """
+    Answers from a recording made with the "record" backend; a request that was not recorded
+    fails with a (non-retryable) 404. With `timing` the recorded latencies are reproduced.
+    """
+
+    def __init__(self, path: str = LLM_RECORDING_PATH, timing: bool = LLM_REPLAY_TIMING):
+        self.timing = timing
+        self._answers: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self._answers.setdefault(row["key"], row)  # first answer wins: deterministic
+        else:
+            logger.warning(f"[LLM] No recording at {path}; every replayed call will fail.")
+        self.chat = _Chat(self._create)
+
+    def _create(self, stream: bool = False, **request):
+        row = self._answers.get(request_key(request))
+        if row is None:
+            raise SimulatedAPIError(404, "Request not found in the LLM recording.")
+        content = row["content"]
+        seconds = row.get("seconds", 0.0) if self.timing else 0.0
+        if stream:
+            ttft = (row.get("ttft") or 0.0) if self.timing else 0.0
+            pieces = max(1, math.ceil(len(content) / (_STREAM_CHUNK_TOKENS * 4)))
+            return _stream(request, content, ttft, lambda _: max(0.0, seconds - ttft) / pieces)
+        time.sleep(seconds)
+        return _response(request, content)
+
+
+def backend_needs_api_key(backend: str = LLM_BACKEND) -> bool:
+    return backend in ("openai", "record")
+
+
+_standins: Dict[str, object] = {}
+_standins_lock = threading.Lock()
+
+
+def get_llm_client(api_key: Optional[str] = None, backend: str = LLM_BACKEND):
+    """
+    A chat client for `backend` (default LLM_BACKEND). SDK retries are disabled because the
+    shared LLM limiter retries (see concurrency_utils). Stand-ins are shared per process.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if backend in ("local", "replay"):
+        with _standins_lock:
+            if backend not in _standins:
+                _standins[backend] = LocalChatClient() if backend == "local" else ReplayChatClient()
+            return _standins[backend]
+    from openai import OpenAI
+    client = OpenAI(api_key=api_key, max_retries=0) if api_key else OpenAI(max_retries=0)
+    return RecordingChatClient(client) if backend == "record" else client
@@ -1,15 +1,27 @@
 # ok_mvp/llm_utils.py
 from __future__ import annotations
 
+import hashlib
 import os
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+from .cache_utils import get_from_cache, save_to_cache
+from .chunk_utils import get_token_counter, iter_chunk_spans
+from .compress_utils import compress_text
+from .concurrency_utils import chat_completion
+from .llm_backend_utils import backend_needs_api_key, get_llm_client
 from .logger import get_logger
+from .prompt_utils import Prompt, build_messages, register_prompt
+from .usage_utils import llm_usage
 from .config import (
+    LLM_BACKEND,
     LLM_MODEL,
-    CHUNK_MAX_CHARS,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
     CORPUS_HARD_CAP_CHARS,
     MAX_MAP_SUMMARIES_FOR_REDUCE,
+    PRECOMPRESS_RATIO,
+    SUMMARY_CACHE,
 )
 
 logger = get_logger()
@@ -21,26 +33,36 @@ try:
 except Exception:
     pass
 
-# Optional OpenAI client (installed in this project)
+# Chat client for LLM_BACKEND: the OpenAI API or an offline stand-in (see llm_backend_utils)
 try:
-    from openai import OpenAI  # openai>=1.x
-    if not os.getenv("OPENAI_API_KEY"):
+    if backend_needs_api_key() and not os.getenv("OPENAI_API_KEY"):
         logger.warning("OPENAI_API_KEY not found in environment (check your .env).")
-    _openai_client: OpenAI | None = OpenAI()
+    _openai_client = get_llm_client()
 except Exception as e:
-    logger.warning(f"OpenAI client init failed: {e}")
+    logger.warning(f"LLM client init failed: {e}")
     _openai_client = None
 
 
-def _approx_token_len(text: str) -> int:
-    # Very rough heuristic: ~4 chars/token
-    return max(1, len(text) // 4)
+def estimate_tokens(text: str) -> int:
+    """Count (or estimate, without tiktoken) the prompt tokens `text` will cost (0 for empty text)."""
+    return get_token_counter()(text) if text else 0
 
 
-def chunk_text(text: str) -> List[str]:
-    """Split text into chunks <= CHUNK_MAX_CHARS, preferring paragraph boundaries."""
+def chunk_text(text: str, compress_ratio: float = PRECOMPRESS_RATIO) -> Iterator[str]:
+    """
+    Split text into chunks of at most CHUNK_MAX_TOKENS tokens, breaking at sentence boundaries.
+    The text is first reduced to its most central sentences (see compress_utils);
+    pass compress_ratio=1 to chunk it verbatim.
+
+    Chunks are yielded one at a time, so only the chunk being summarized is held as a string.
+    """
     if not text:
-        return []
+        return
+
+    original_len = len(text)
+    text = compress_text(text, compress_ratio)
+    if len(text) < original_len:
+        logger.info(f"Pre-compressed corpus {original_len:,} -> {len(text):,} chars.")
 
     if len(text) > CORPUS_HARD_CAP_CHARS:
         logger.warning(
@@ -48,96 +70,125 @@ def chunk_text(text: str) -> List[str]:
         )
         text = text[:CORPUS_HARD_CAP_CHARS]
 
-    chunks: List[str] = []
-    buf: List[str] = []
-    buf_len = 0
-
-    for para in text.split("\n\n"):
-        para = para.strip()
-        if not para:
-            continue
-        if buf_len + len(para) + 2 <= CHUNK_MAX_CHARS:
-            buf.append(para)
-            buf_len += len(para) + 2
-        else:
-            if buf:
-                chunks.append("\n\n".join(buf))
-            if len(para) > CHUNK_MAX_CHARS:
-                start = 0
-                while start < len(para):
-                    end = min(start + CHUNK_MAX_CHARS, len(para))
-                    chunks.append(para[start:end])
-                    start = end
-                buf, buf_len = [], 0
-            else:
-                buf = [para]
-                buf_len = len(para)
-
-    if buf:
-        chunks.append("\n\n".join(buf))
-
-    return chunks
-
-
-def _openai_chat(prompt: str, content: str) -> str:
-    """Single call wrapper to OpenAI Chat Completions; returns text or raises."""
+    for chunk in iter_chunk_spans(text, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS):
+        yield chunk.text(text)
+
+
+def build_chat_request(prompt: Prompt, content: str, context: Optional[str] = None) -> dict:
+    """Chat Completions arguments for a registered prompt, in cache order (see prompt_utils)."""
+    return dict(
+        model=LLM_MODEL,
+        messages=build_messages(prompt, context=context, content=content),
+        temperature=0.2,
+    )
+
+
+def _openai_chat(prompt: Prompt, content: str, context: Optional[str] = None) -> str:
+    """Single call to OpenAI Chat Completions (through the LLM limiter); returns text or raises."""
     if _openai_client is None:
         raise RuntimeError("OPENAI_API_KEY not configured or openai client not available.")
 
-    messages = [
-        {"role": "system", "content": "You are a concise research synthesizer."},
-        {"role": "user", "content": f"{prompt}\n\n---\n\n{content}"},
-    ]
+    # Throttles and server errors are retried by the shared limiter; anything else propagates.
+    resp = chat_completion(_openai_client, **build_chat_request(prompt, content, context))
+    txt = resp.choices[0].message.content or ""
+    return txt.strip()
 
-    try:
-        resp = _openai_client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=messages,
-            temperature=0.2,
-        )
-        txt = resp.choices[0].message.content or ""
-        return txt.strip()
-    except Exception as e:
-        raise RuntimeError(str(e))
 
+# Bump a prompt's version whenever its text changes; the map version is also part of the
+# summary cache key, so cached per-source summaries are not reused across versions.
+MAP_PROMPT = register_prompt("map", 2, """
+You are a concise research synthesizer.
+Summarize the section the user gives you. Focus on key facts, trends, implications, and opportunities.
+Be concise and bulleted.
+""")
+REDUCE_PROMPT = register_prompt("reduce", 1, """
+You are a concise research synthesizer.
+You are given bullet summaries from multiple sections, after the user's request.
+Synthesize them into a single, concise set of bullet points with clear, actionable insights and
+opportunities, answering the user's request. Avoid repetition.
+""")
 
-def call_llm(prompt: str, chunks: List[str]) -> str:
+
+def _map_chunks(chunks: Iterable[str]) -> Tuple[List[str], int]:
     """
-    Robust map-reduce summarization:
-      - Map: summarize each chunk
-      - Reduce: synthesize the summaries
+    Summarize each chunk with MAP_PROMPT. Returns the non-empty summaries in order and the
+    number of chunks that failed or came back empty (and are missing from the summaries).
     """
-    if not chunks:
-        return "No input text provided."
-
-    # Map
     map_summaries: List[str] = []
+    failed = 0
     for i, ch in enumerate(chunks, 1):
         try:
-            summary = _openai_chat(
-                prompt=("Summarize the following section. Focus on key facts, trends, "
-                        "implications, and opportunities. Be concise and bulleted."),
-                content=ch,
-            )
+            summary = _openai_chat(MAP_PROMPT, content=ch)
         except Exception as e:
             logger.warning(f"LLM map step failed on chunk {i}: {e}")
             summary = ""
         if summary:
             map_summaries.append(summary)
+        else:
+            failed += 1
+    return map_summaries, failed
+
+
+def summary_cache_key(source_id: str, text: str, backend: str = LLM_BACKEND) -> str:
+    """
+    Cache key of a source's map summary: source ID, content hash, model and prompt version,
+    plus the compression/chunking settings that shape what the model sees. Summaries written by
+    a stand-in `backend` ("local", "replay") get their own keys, so canned text never reaches a
+    real run; "record" calls the real API and shares the "openai" keys.
+    """
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    backend = "openai" if backend == "record" else backend
+    parts = [source_id, content_hash, LLM_MODEL, f"v{MAP_PROMPT.version}",
+             f"r{PRECOMPRESS_RATIO}", f"t{CHUNK_MAX_TOKENS}", f"o{CHUNK_OVERLAP_TOKENS}"]
+    if backend != "openai":
+        parts.append(f"b{backend}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:40]
 
+
+def map_summarize(text: str, source_id: Optional[str] = None) -> str:
+    """
+    Map step for one source: chunk (and pre-compress) its text and summarize each chunk.
+    Returns the chunk summaries joined in order ("" if nothing could be summarized).
+
+    With a `source_id` (e.g. the source URL) a complete summary is cached, so a rerun only
+    summarizes sources that are new, whose text changed or that had a chunk fail.
+    """
+    key = summary_cache_key(source_id, text) if source_id and SUMMARY_CACHE else None
+    if key:
+        cached = get_from_cache("summaries", key)
+        if cached:
+            return cached
+    with llm_usage("map"):
+        map_summaries, failed = _map_chunks(chunk_text(text))
+    summary = "\n\n".join(map_summaries)
+    # An incomplete summary is still used for this run, but not cached: a rerun retries the source.
+    if key and summary and not failed:
+        save_to_cache("summaries", key, summary)
+    elif key and failed:
+        logger.warning(f"Not caching the summary of {source_id}: {failed} chunk(s) failed.")
+    return summary
+
+
+def call_llm(prompt: str, chunks: Iterable[str]) -> str:
+    """
+    Robust map-reduce summarization:
+      - Map: summarize each chunk (`chunks` may be a generator such as chunk_text's)
+      - Reduce: synthesize the summaries
+    """
+    # Map
+    with llm_usage("map"):
+        map_summaries, failed = _map_chunks(chunks)
+
+    if not map_summaries and not failed:
+        return "No input text provided."
     if not map_summaries:
         return "No summaries produced (all map steps failed)."
 
     # Reduce (cap number of summaries to keep context small)
     reduce_input = "\n\n---\n\n".join(map_summaries[:MAX_MAP_SUMMARIES_FOR_REDUCE])
     try:
-        final = _openai_chat(
-            prompt=(f"{prompt}\n\n"
-                    "You are given bullet summaries from multiple sections. "
-                    "Synthesize them into a single, concise set of bullet points with "
-                    "clear, actionable insights and opportunities. Avoid repetition."),
-            content=reduce_input,
-        )
+        with llm_usage("reduce"):
+            final = _openai_chat(REDUCE_PROMPT, content=reduce_input, context=prompt)
     except Exception as e:
         logger.warning(f"LLM reduce step failed; returning concatenated map summaries. Error: {e}")
         final = reduce_input
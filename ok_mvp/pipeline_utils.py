@@ -0,0 +1,106 @@
+# ok_mvp/pipeline_utils.py
+"""
+Producer/consumer stage that map-summarizes sources while the others are still downloading.
+
+Source modules call `MapPipeline.submit` (via their `on_source` hook) as soon as a transcript
+or paper is ready; worker tasks chunk and summarize it in a thread, so LLM latency overlaps
+fetch latency instead of being stacked after it. The final synthesis then reduces the
+per-source summaries, which are cached per source (see llm_utils.map_summarize), so a rerun
+only pays for new or changed sources. Near-duplicates of a source that already arrived are
+not summarized.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import MAP_PIPELINE_CONCURRENCY, DEDUPE_NEAR_DUPLICATES, DEDUPE_JACCARD_THRESHOLD
+from .dedupe_utils import LSHIndex, minhash
+from .llm_utils import map_summarize
+from .logger import get_logger
+
+logger = get_logger()
+
+
+class MapPipeline:
+    """
+    Queue of (evidence, text) items consumed by `concurrency` summarizer workers.
+
+    Results are keyed by the identity of the evidence dict the producer submitted, so the
+    caller can line summaries up with the evidence lists the source modules return.
+    """
+
+    def __init__(self, summarize: Callable[[str, Optional[str]], str] = map_summarize,
+                 concurrency: int = MAP_PIPELINE_CONCURRENCY, dedupe: bool = DEDUPE_NEAR_DUPLICATES):
+        self._summarize = summarize
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._summaries: Dict[int, str] = {}
+        self._duplicates: Dict[int, dict] = {}
+        self._index: Optional[LSHIndex] = LSHIndex() if dedupe else None
+        self._seen: List[dict] = []
+        self._started = time.perf_counter()
+        self._busy_seconds = 0.0
+        self._closed = False
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, concurrency))]
+
+    def submit(self, evidence: dict, text: str) -> None:
+        """Queue one source for summarization (called by producers as each source lands)."""
+        if self._closed:
+            return
+        if self._index is not None:
+            signature = minhash(text)
+            matches = self._index.query(signature, DEDUPE_JACCARD_THRESHOLD) if signature else []
+            if matches:
+                self._duplicates[id(evidence)] = self._seen[min(matches)]
+                logger.info(f"[Pipeline] Skipping near-duplicate source '{evidence.get('title', '')}'.")
+                return
+            if signature:
+                self._index.add(len(self._seen), signature)
+                self._seen.append(evidence)
+        self._queue.put_nowait((evidence, text))
+
+    async def _worker(self) -> None:
+        while True:
+            evidence, text = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                self._summaries[id(evidence)] = await asyncio.to_thread(
+                    self._summarize, text, evidence.get("url") or None)
+            except Exception as e:
+                logger.warning(f"[Pipeline] Map step failed for '{evidence.get('title', '')}': {e}")
+                self._summaries[id(evidence)] = ""
+            finally:
+                self._busy_seconds += time.perf_counter() - started
+                self._queue.task_done()
+
+    async def finish(self) -> None:
+        """Wait for every queued source to be summarized, then stop the workers."""
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        logger.info(f"[Pipeline] Summarized {len(self._summaries)} sources; "
+                    f"{self._busy_seconds:.1f}s of map time overlapped {time.perf_counter() - self._started:.1f}s wall.")
+
+    def close(self) -> None:
+        """
+        Abandon the pipeline: stop the workers and drop queued sources (a summary already
+        running in a thread still completes, but nothing new is started).
+        """
+        self._closed = True
+        for worker in self._workers:
+            worker.cancel()
+        dropped = self._queue.qsize()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        if dropped:
+            logger.info(f"[Pipeline] Closed with {dropped} source(s) left unsummarized.")
+
+    def summary_for(self, evidence: dict) -> str:
+        """The map summary of a submitted source ("" for duplicates and failures)."""
+        return self._summaries.get(id(evidence), "")
+
+    def duplicate_of(self, evidence: dict) -> Optional[dict]:
+        """The earlier source this one near-duplicates, if it was skipped."""
+        return self._duplicates.get(id(evidence))
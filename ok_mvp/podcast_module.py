@@ -1,56 +1,491 @@
 # ok_mvp/podcast_module.py
 import asyncio
+import json
+import random
+import threading
 from taddy import Taddy
 
 # Assuming these utilities are in your project
 from .cache_utils import get_from_cache, save_to_cache
+from .config import (
+    TADDY_MAX_CONCURRENCY,
+    TADDY_MAX_RETRIES,
+    TADDY_BACKOFF_BASE,
+    TADDY_TRANSCRIPT_BATCH_SIZE,
+    PODCAST_ONDEMAND_TRANSCRIPTS,
+    PODCAST_TRANSCRIPT_POLL_INTERVAL,
+    PODCAST_TRANSCRIPT_POLL_MIN,
+    PODCAST_TRANSCRIPT_TIMEOUT,
+    PODCAST_ONDEMAND_RUN_WAIT,
+    PODCAST_TRANSCRIPT_DRAIN_SECONDS,
+)
+from .http_utils import http_post, async_http_post
 from .logger import get_logger
 
 logger = get_logger()
 
-def _search_podcasts(api_key, query, max_results):
+TADDY_GRAPHQL_URL = "https://api.taddy.org"
+
+_TRANSCRIPT_QUERY = """
+query GetEpisodeTranscript($uuid: ID!) {
+  getEpisodeTranscript(uuid: $uuid, useOnDemandCreditsIfNeeded: false) {
+    id
+    text
+  }
+}
+"""
+
+# One long-lived SDK client and one request limiter per process.
+_taddy_client = None
+_taddy_client_lock = threading.Lock()
+_taddy_semaphore = None
+_taddy_semaphore_loop = None
+_scheduler = None
+
+
+class TaddyRequestFailed(Exception):
+    """Raised (when asked for) by _graphql_request_async for a failed request other than a timeout or 429."""
+
+
+class TaddyRateLimited(Exception):
+    """Raised when Taddy answers 429; carries the server's Retry-After hint if any."""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f"Taddy rate limit hit (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+def _get_taddy(api_key):
+    """Return the process-wide Taddy SDK client, creating it on first use."""
+    global _taddy_client
+    if _taddy_client is None:
+        with _taddy_client_lock:
+            if _taddy_client is None:
+                _taddy_client = Taddy(api_key)
+    return _taddy_client
+
+def _raise_if_rate_limited(e):
+    # The SDK does not expose a typed error, so look for the status on the exception.
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status == 429 or "too many requests" in str(e).lower():
+        raise TaddyRateLimited() from e
+
+def _taddy_limit():
+    """The TADDY_MAX_CONCURRENCY semaphore of the running loop, shared by every Taddy request."""
+    global _taddy_semaphore, _taddy_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _taddy_semaphore is None or _taddy_semaphore_loop is not loop:
+        _taddy_semaphore, _taddy_semaphore_loop = asyncio.Semaphore(max(1, TADDY_MAX_CONCURRENCY)), loop
+    return _taddy_semaphore
+
+def _taddy_backoff(attempt, retry_after=None):
+    delay = retry_after if retry_after is not None else TADDY_BACKOFF_BASE * (2 ** attempt)
+    return delay + random.uniform(0, TADDY_BACKOFF_BASE)
+
+async def _call_taddy(fn, *args):
+    """
+    Run a blocking Taddy call in the default executor under the Taddy concurrency limit,
+    retrying 429 responses with jittered exponential backoff (honoring Retry-After).
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(TADDY_MAX_RETRIES + 1):
+        try:
+            async with _taddy_limit():
+                return await loop.run_in_executor(None, fn, *args)
+        except TaddyRateLimited as e:
+            if attempt == TADDY_MAX_RETRIES:
+                logger.error(f"  [Podcast] Giving up after {attempt + 1} rate-limited attempts.")
+                return None
+            delay = _taddy_backoff(attempt, e.retry_after)
+            logger.warning(f"  [Podcast] 429 from Taddy; backing off {delay:.1f}s (attempt {attempt + 1}).")
+            await asyncio.sleep(delay)
+        except Exception as e:
+            logger.error(f"  [Podcast] Taddy call {fn.__name__} failed: {e}")
+            return None
+
+def _graphql_request(api_key, user_id, query, variables, timeout=None, partial=False):
+    """
+    Send one GraphQL request to Taddy over the shared HTTP pool; returns `data` or None.
+    With `partial`, returns (data, errors) so the fields that resolved survive errors in others.
+    """
+    headers = {"Content-Type": "application/json", "X-USER-ID": user_id, "X-API-KEY": api_key}
+    try:
+        resp = http_post(TADDY_GRAPHQL_URL, json={"query": query, "variables": variables},
+                         headers=headers, timeout=timeout)
+    except Exception as e:
+        logger.error(f"  [Podcast] Request failed: {e}")
+        return None
+    if resp.status_code == 429:
+        retry_after = resp.headers.get("Retry-After")
+        raise TaddyRateLimited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+    if resp.status_code != 200:
+        logger.error(f"  [Podcast] API error {resp.status_code}: {resp.text[:200]}")
+        return None
+    payload = resp.json()
+    if payload.get("errors"):
+        logger.error(f"  [Podcast] GraphQL errors: {payload['errors']}")
+        if partial:
+            return payload.get("data"), payload["errors"]
+        return None
+    return (payload.get("data") or {}, []) if partial else payload.get("data") or {}
+
+def _search_podcasts(api_key, query, max_results, transcripts_only=True):
     logger.info(f"  [Podcast] Searching for top {max_results} episodes for query: '{query}'")
-    taddy = Taddy(api_key)
-    response = taddy.search_for_podcast_episodes(
-        query=query, page=1, per_page=max_results, filter_for_transcripts=True
-    )
+    try:
+        response = _get_taddy(api_key).search_for_podcast_episodes(
+            query=query, page=1, per_page=max_results, filter_for_transcripts=transcripts_only
+        )
+    except Exception as e:
+        _raise_if_rate_limited(e)
+        raise
     episodes = response.data.search_for_podcast_episodes.podcast_episodes
-    logger.info(f"  [Podcast] Found {len(episodes)} episodes with transcripts.")
+    suffix = " with transcripts" if transcripts_only else ""
+    logger.info(f"  [Podcast] Found {len(episodes)} episodes{suffix}.")
     return episodes
 
-def _get_transcript(api_key, episode_uuid):
+def _get_transcript(api_key, episode_uuid, user_id=None):
     cached = get_from_cache("podcast", episode_uuid)
     if cached: return cached
-    
-    taddy = Taddy(api_key)
-    response = taddy.get_podcast_episode(uuid=episode_uuid)
-    transcript_obj = response.data.get_podcast_episode.podcast_episode.transcript
-    
-    if transcript_obj:
-        transcript = " ".join([line.text for line in transcript_obj])
+
+    if user_id:
+        # Raw GraphQL over the pooled session keeps the connection to Taddy alive across episodes.
+        data = _graphql_request(api_key, user_id, _TRANSCRIPT_QUERY, {"uuid": episode_uuid})
+        items = (data or {}).get("getEpisodeTranscript") or []
+        transcript = " ".join(item.get("text", "") for item in items).strip() or None
+    else:
+        try:
+            response = _get_taddy(api_key).get_podcast_episode(uuid=episode_uuid)
+        except Exception as e:
+            _raise_if_rate_limited(e)
+            raise
+        transcript_obj = response.data.get_podcast_episode.podcast_episode.transcript
+        transcript = " ".join([line.text for line in transcript_obj]) if transcript_obj else None
+
+    if transcript:
         save_to_cache("podcast", episode_uuid, transcript)
         return transcript
     return None
 
-async def research(search_terms: list[str], config: dict) -> tuple:
+def _build_batch_query(count):
+    """Build an aliased query fetching `count` transcripts in one request (aliases e0..eN)."""
+    params = ", ".join(f"$u{i}: ID!" for i in range(count))
+    fields = "\n".join(
+        f"  e{i}: getEpisodeTranscript(uuid: $u{i}, useOnDemandCreditsIfNeeded: false) {{ id text }}"
+        for i in range(count)
+    )
+    return f"query GetEpisodeTranscripts({params}) {{\n{fields}\n}}"
+
+def _fetch_transcript_batch(api_key, user_id, episode_uuids):
+    """
+    Fetch several transcripts with one aliased GraphQL request.
+
+    Returns ({uuid: transcript or None}, [uuids whose alias failed]); an error in one alias (e.g.
+    a bad UUID) only fails that alias, a rejected request fails them all.
+    """
+    variables = {f"u{i}": uuid for i, uuid in enumerate(episode_uuids)}
+    result = _graphql_request(api_key, user_id, _build_batch_query(len(episode_uuids)), variables, partial=True)
+    data, errors = result if result is not None else (None, [])
+    if data is None:
+        return {}, list(episode_uuids)
+    failed_aliases = {str(error["path"][0]) for error in errors if error.get("path")}
+    out, failed = {}, []
+    for i, uuid in enumerate(episode_uuids):
+        if f"e{i}" in failed_aliases:
+            failed.append(uuid)
+            continue
+        items = data.get(f"e{i}") or []
+        transcript = " ".join(item.get("text", "") for item in items).strip() or None
+        if transcript:
+            save_to_cache("podcast", uuid, transcript)
+        out[uuid] = transcript
+    return out, failed
+
+async def _get_transcripts_batched(api_key, user_id, episode_uuids, batch_size):
+    """Resolve transcripts for many episodes: cache first, then batched GraphQL, then per-item fallback."""
+    transcripts = {uuid: get_from_cache("podcast", uuid) for uuid in episode_uuids}
+    missing = [uuid for uuid in dict.fromkeys(episode_uuids) if not transcripts[uuid]]
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+
+    async def run_batch(batch):
+        result = await _call_taddy(_fetch_transcript_batch, api_key, user_id, batch)
+        if result is None:
+            # Still rate limited after the retries: more requests would only make it worse.
+            logger.warning(f"  [Podcast] Batch of {len(batch)} transcripts not fetched (rate limited).")
+            return
+        fetched, failed = result
+        transcripts.update(fetched)
+        if failed:
+            logger.warning(f"  [Podcast] {len(failed)} of {len(batch)} batched transcripts failed; "
+                           "requesting them individually.")
+            retried = await asyncio.gather(*[_call_taddy(_get_transcript, api_key, u, user_id) for u in failed])
+            transcripts.update(zip(failed, retried))
+
+    await asyncio.gather(*[run_batch(batch) for batch in batches])
+    logger.info(f"  [Podcast] Fetched {len(missing)} uncached transcripts in {len(batches)} batched request(s).")
+    return transcripts
+
+async def _graphql_request_async(api_key, user_id, query, variables, timeout=None, raise_on_error=False):
+    """
+    Async twin of _graphql_request over the loop's aiohttp pool; never occupies a worker thread.
+    Runs under the Taddy concurrency limit. With `raise_on_error`, a failed request (transport
+    error, non-200 status, unreadable body or GraphQL errors) raises TaddyRequestFailed instead of
+    returning None, so only a timeout returns None.
+    """
+    headers = {"Content-Type": "application/json", "X-USER-ID": user_id, "X-API-KEY": api_key}
+
+    def failed(message):
+        logger.error(f"  [Podcast] {message}")
+        if raise_on_error:
+            raise TaddyRequestFailed(message)
+        return None
+
+    try:
+        async with _taddy_limit():
+            status, resp_headers, body = await async_http_post(
+                TADDY_GRAPHQL_URL, json={"query": query, "variables": variables}, headers=headers, timeout=timeout
+            )
+    except asyncio.TimeoutError:
+        return None
+    except Exception as e:
+        return failed(f"Request failed: {e}")
+    if status == 429:
+        retry_after = resp_headers.get("Retry-After")
+        raise TaddyRateLimited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+    if status != 200:
+        return failed(f"API error {status}: {body[:200]}")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return failed(f"Non-JSON response: {body[:200]}")
+    if payload.get("errors"):
+        return failed(f"GraphQL errors: {payload['errors']}")
+    return payload.get("data") or {}
+
+
+class TranscriptionScheduler:
+    """
+    Requests on-demand Taddy transcripts and polls every pending job from one asyncio task.
+
+    `submit()` returns a future resolved with the transcript (or None on failure/timeout).
+    All requests are async HTTP, so waiting on a job never holds an executor thread.
+    Completed transcripts are written to the cache even if nobody is awaiting them any more.
+    """
+
+    _SUBMIT_QUERY = """
+    query RequestTranscript($uuid: ID!) {
+      getEpisodeTranscript(uuid: $uuid, useOnDemandCreditsIfNeeded: true) { id text }
+    }
+    """
+    _SUBMIT_TIMEOUT = 15  # seconds; generation continues server-side after we stop waiting
+
+    def __init__(self, api_key, user_id):
+        self.api_key = api_key
+        self.user_id = user_id
+        self._loop = asyncio.get_running_loop()
+        self._jobs = {}  # uuid -> {"future": Future, "deadline": loop time, "accepted": bool}
+        self._requests = set()  # in-flight _request tasks, cancelled by drain()
+        self._poll_task = None
+
+    def submit(self, episode_uuid):
+        """Schedule an on-demand transcript for an episode; returns the job's future."""
+        job = self._jobs.get(episode_uuid)
+        if job:
+            return job["future"]
+        future = self._loop.create_future()
+        self._jobs[episode_uuid] = {"future": future, "deadline": self._loop.time() + PODCAST_TRANSCRIPT_TIMEOUT,
+                                    "accepted": False}
+        task = self._loop.create_task(self._request(episode_uuid))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = self._loop.create_task(self._poll_loop())
+        logger.info(f"  [Podcast] Requested on-demand transcript for {episode_uuid}.")
+        return future
+
+    def pending(self):
+        """Return the UUIDs of jobs that have not completed yet."""
+        return list(self._jobs)
+
+    def _complete(self, episode_uuid, transcript):
+        job = self._jobs.pop(episode_uuid, None)
+        if transcript:
+            save_to_cache("podcast", episode_uuid, transcript)
+        if job and not job["future"].done():
+            job["future"].set_result(transcript)
+
+    async def _request(self, episode_uuid):
+        # Kick off generation; if Taddy happens to answer with text before the timeout we're done early.
+        # A timeout means the request arrived; a 429 or failed request was never accepted, so resubmit.
+        for attempt in range(TADDY_MAX_RETRIES + 1):
+            try:
+                data = await _graphql_request_async(self.api_key, self.user_id, self._SUBMIT_QUERY,
+                                                    {"uuid": episode_uuid}, timeout=self._SUBMIT_TIMEOUT,
+                                                    raise_on_error=True)
+            except (TaddyRateLimited, TaddyRequestFailed) as e:
+                if episode_uuid not in self._jobs:
+                    return
+                if attempt == TADDY_MAX_RETRIES:
+                    logger.error(f"  [Podcast] Could not request a transcript for {episode_uuid}: {e}")
+                    self._complete(episode_uuid, None)
+                    return
+                await asyncio.sleep(_taddy_backoff(attempt, getattr(e, "retry_after", None)))
+                continue
+            items = (data or {}).get("getEpisodeTranscript") or []
+            transcript = " ".join(item.get("text", "") for item in items).strip()
+            if transcript:
+                self._complete(episode_uuid, transcript)
+            elif episode_uuid in self._jobs:
+                self._jobs[episode_uuid]["accepted"] = True
+            return
+
+    async def _poll_once(self, uuids):
+        """Check status for all pending jobs in one aliased request; returns the number completed."""
+        query = "query PollTranscribeStatus({}) {{\n{}\n}}".format(
+            ", ".join(f"$u{i}: ID!" for i in range(len(uuids))),
+            "\n".join(f"  e{i}: getPodcastEpisode(uuid: $u{i}) {{ uuid taddyTranscribeStatus }}"
+                      for i in range(len(uuids))),
+        )
+        data = await _graphql_request_async(self.api_key, self.user_id, query,
+                                            {f"u{i}": u for i, u in enumerate(uuids)})
+        if data is None:
+            return 0
+        statuses = {u: (data.get(f"e{i}") or {}).get("taddyTranscribeStatus") for i, u in enumerate(uuids)}
+        # NOT_TRANSCRIBING only means the job was dropped once Taddy has accepted the request;
+        # before that it is just the status of an episode nobody has asked about yet.
+        dropped = [u for u, status in statuses.items()
+                   if status == "NOT_TRANSCRIBING" and u in self._jobs and self._jobs[u]["accepted"]]
+        for u in dropped:
+            logger.warning(f"  [Podcast] On-demand transcription for {u} is not running.")
+            self._complete(u, None)
+        finished = [u for u, status in statuses.items() if status in ("COMPLETED", "FAILED")]
+        if not finished:
+            return len(dropped)
+        texts = await _graphql_request_async(self.api_key, self.user_id, _build_batch_query(len(finished)),
+                                             {f"u{i}": u for i, u in enumerate(finished)})
+        if texts is None:
+            # The text request timed out: keep the jobs pending so the next poll fetches the (paid) text.
+            return len(dropped)
+        for i, u in enumerate(finished):
+            items = texts.get(f"e{i}") or []
+            transcript = " ".join(item.get("text", "") for item in items).strip() or None
+            if not transcript:
+                logger.warning(f"  [Podcast] On-demand transcription for {u} finished without text.")
+            self._complete(u, transcript)
+        return len(dropped) + len(finished)
+
+    async def _poll_loop(self):
+        interval = min(PODCAST_TRANSCRIPT_POLL_MIN, PODCAST_TRANSCRIPT_POLL_INTERVAL)
+        while self._jobs:
+            await asyncio.sleep(interval)
+            now = self._loop.time()
+            for uuid in [u for u, job in self._jobs.items() if job["deadline"] <= now]:
+                logger.warning(f"  [Podcast] On-demand transcript for {uuid} timed out.")
+                self._complete(uuid, None)
+            if not self._jobs:
+                break
+            try:
+                completed = await self._poll_once(list(self._jobs))
+            except TaddyRateLimited as e:
+                completed = 0
+                interval = max(interval, e.retry_after or 0)
+            except Exception as e:
+                # Keep the loop (and the job deadlines) alive whatever a poll runs into.
+                logger.error(f"  [Podcast] Polling on-demand transcripts failed: {e}")
+                completed = 0
+                interval = PODCAST_TRANSCRIPT_POLL_INTERVAL
+            # Adaptive backoff: poll eagerly while jobs are finishing, back off while nothing changes.
+            if completed:
+                interval = min(PODCAST_TRANSCRIPT_POLL_MIN, PODCAST_TRANSCRIPT_POLL_INTERVAL)
+            else:
+                interval = min(interval * 1.5, PODCAST_TRANSCRIPT_POLL_INTERVAL)
+
+    async def drain(self, timeout):
+        """Keep polling leftover jobs for up to `timeout` seconds, then abandon the rest."""
+        futures = [job["future"] for job in self._jobs.values()]
+        if futures and timeout > 0:
+            logger.info(f"  [Podcast] Waiting up to {timeout:.0f}s for {len(futures)} on-demand transcript(s).")
+            await asyncio.wait(futures, timeout=timeout)
+        if self._jobs:
+            logger.warning(f"  [Podcast] Abandoning {len(self._jobs)} unfinished on-demand job(s); "
+                           "Taddy keeps generating them and the next run will pick them up.")
+        # Requests still in flight (or sleeping in backoff) must not outlive the loop's session.
+        tasks = [*self._requests, *([self._poll_task] if self._poll_task is not None else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _get_scheduler(api_key, user_id):
+    """Return the TranscriptionScheduler for the running event loop."""
+    global _scheduler
+    if _scheduler is None or _scheduler._loop is not asyncio.get_running_loop():
+        _scheduler = TranscriptionScheduler(api_key, user_id)
+    return _scheduler
+
+async def drain_transcription_jobs(timeout=PODCAST_TRANSCRIPT_DRAIN_SECONDS):
+    """Give outstanding on-demand jobs a last chance to finish (and be cached) before the process exits."""
+    if _scheduler is not None and _scheduler._loop is asyncio.get_running_loop():
+        await _scheduler.drain(timeout)
+
+def _episode_evidence(episode):
+    return {
+        "index": -1, "source_type": "Podcast",
+        "title": episode.title, "author": episode.podcast_series.name,
+        "url": episode.share_url, "key_quote": "",
+    }
+
+async def research(search_terms: list[str], config: dict, on_source=None) -> tuple:
     print("  Calling Podcast Module...")
     api_key = config.get("TADDY_API_KEY")
+    user_id = config.get("TADDY_USER_ID")
     max_results = config.get("MAX_RESULTS_PER_SOURCE", 3)
     main_query = search_terms[0] if search_terms else ""
     if not api_key or not main_query:
         return [], []
 
-    loop = asyncio.get_running_loop()
-    episodes = await loop.run_in_executor(None, _search_podcasts, api_key, main_query, max_results)
-    
+    # On-demand transcription needs raw GraphQL (TADDY_USER_ID); otherwise only keep transcribed episodes.
+    on_demand = bool(user_id) and config.get("PODCAST_ONDEMAND_TRANSCRIPTS", PODCAST_ONDEMAND_TRANSCRIPTS)
+    episodes = await _call_taddy(_search_podcasts, api_key, main_query, max_results, not on_demand) or []
+
+    batch_size = config.get("TADDY_TRANSCRIPT_BATCH_SIZE", TADDY_TRANSCRIPT_BATCH_SIZE)
+    if user_id and batch_size > 1:
+        by_uuid = await _get_transcripts_batched(api_key, user_id, [e.uuid for e in episodes], batch_size)
+        transcripts = [by_uuid.get(episode.uuid) for episode in episodes]
+    else:
+        transcripts = await asyncio.gather(
+            *[_call_taddy(_get_transcript, api_key, episode.uuid, user_id) for episode in episodes]
+        )
+
+    found = {}
+
+    def emit(episode, transcript):
+        evidence = _episode_evidence(episode)
+        if on_source: on_source(evidence, transcript)
+        found[episode.uuid] = (evidence, transcript)
+
+    # Hand over the transcripts we already have before waiting on any on-demand jobs.
+    for episode, transcript in zip(episodes, transcripts):
+        if transcript and episode.uuid not in found:
+            emit(episode, transcript)
+
+    if on_demand:
+        missing = [e.uuid for e, t in zip(episodes, transcripts) if not t]
+        if missing:
+            scheduler = _get_scheduler(api_key, user_id)
+            jobs = {uuid: scheduler.submit(uuid) for uuid in missing}
+            run_wait = config.get("PODCAST_ONDEMAND_RUN_WAIT", PODCAST_ONDEMAND_RUN_WAIT)
+            await asyncio.wait(jobs.values(), timeout=run_wait)
+            ready = {uuid: job.result() for uuid, job in jobs.items() if job.done()}
+            logger.info(f"  [Podcast] {sum(1 for t in ready.values() if t)}/{len(missing)} on-demand transcripts "
+                        "ready for this run; the rest keep polling in the background.")
+            for episode in episodes:
+                if ready.get(episode.uuid) and episode.uuid not in found:
+                    emit(episode, ready[episode.uuid])
+
     source_evidence, content_for_synthesis = [], []
     for episode in episodes:
-        transcript = await loop.run_in_executor(None, _get_transcript, api_key, episode.uuid)
-        if transcript:
-            source_evidence.append({
-                "index": -1, "source_type": "Podcast",
-                "title": episode.title, "author": episode.podcast_series.name,
-                "url": episode.share_url, "key_quote": "",
-            })
+        if episode.uuid in found:
+            evidence, transcript = found.pop(episode.uuid)
+            source_evidence.append(evidence)
             content_for_synthesis.append(transcript)
-    return source_evidence, content_for_synthesis
\ No newline at end of file
+    return source_evidence, content_for_synthesis
@@ -0,0 +1,71 @@
+# ok_mvp/prompt_utils.py
+"""
+Prompt assembly with a cache-friendly, fixed layout.
+
+Providers cache the longest previously seen prefix of a prompt (OpenAI: from 1,024 tokens, in
+128-token steps), so every request is laid out from the most to the least shared part:
+
+    system:  the prompt's static instructions       (identical for every call of this prompt)
+    user:    per-submission context                  (e.g. the founder profile or hypothesis)
+             ---
+             per-call content                        (e.g. a chunk or the selected passages)
+
+Prompts are registered with a name and version; bump the version whenever the instructions
+change. Usage records carry the "name@vN" of their prompt (see usage_utils), so the usage report
+shows cached-token hit rates per prompt version, next to the size of its static prefix.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional
+
+from .chunk_utils import get_token_counter
+
+# Smallest prompt prefix the provider caches; shorter static prefixes never produce cached tokens.
+PROVIDER_CACHE_MIN_TOKENS = 1024
+
+_registry: Dict[str, "Prompt"] = {}
+
+
+class Prompt(NamedTuple):
+    name: str
+    version: int
+    instructions: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+
+def register_prompt(name: str, version: int, instructions: str) -> Prompt:
+    """Define a prompt; its instructions become the (static) system message."""
+    prompt = Prompt(name, version, instructions.strip())
+    _registry[prompt.instructions] = prompt
+    return prompt
+
+
+def build_messages(prompt: Prompt, context: Optional[str] = None, content: Optional[str] = None) -> List[dict]:
+    """Messages in cache order: static instructions, then per-submission context, then per-call content."""
+    user = "\n\n---\n\n".join(part.strip() for part in (context, content) if part and part.strip())
+    return [{"role": "system", "content": prompt.instructions}, {"role": "user", "content": user}]
+
+
+def prompt_of(request: dict) -> Optional[Prompt]:
+    """The registered prompt a chat request was built from (None for ad-hoc requests)."""
+    messages = request.get("messages") or []
+    if not messages or messages[0].get("role") != "system":
+        return None
+    return _registry.get(messages[0].get("content", ""))
+
+
+def static_prefix_tokens(prompt: Prompt) -> int:
+    """Tokens of the prompt's static system message (the part every call can share)."""
+    return get_token_counter()(prompt.instructions)
+
+
+def prompt_catalog() -> Dict[str, dict]:
+    """{"name@vN": {"static_prefix_tokens", "cacheable"}} for every registered prompt."""
+    catalog = {}
+    for prompt in _registry.values():
+        tokens = static_prefix_tokens(prompt)
+        catalog[prompt.id] = {"static_prefix_tokens": tokens, "cacheable": tokens >= PROVIDER_CACHE_MIN_TOKENS}
+    return catalog
@@ -0,0 +1,239 @@
+# ok_mvp/retrieval_utils.py
+"""
+Local lexical retrieval used to pick what goes into the synthesis prompt.
+
+Sources are split into passages, indexed with BM25, scored against the hypothesis and
+its search terms, and the best passages are packed into a character budget. The budget
+is first shared out fairly between sources so one long PDF cannot crowd out the rest.
+Passages are offsets into the source texts; only the selected ones are ever copied.
+Everything runs in-process (no network) and takes milliseconds on a hypothesis-sized corpus.
+"""
+from __future__ import annotations
+
+import itertools
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from .config import BM25_K1, BM25_B, PASSAGE_MAX_CHARS
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]?\s")
+
+# Small English stopword list; enough to keep function words from dominating short queries.
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have how i if in into is it
+its it's just like more most not of on or our so than that the their them then there these they
+this to too up us very was we were what when where which while who why will with would you your
+""".split())
+
+
+class Passage(NamedTuple):
+    """A contiguous span [start, end) of one source document."""
+    source_index: int
+    start: int
+    end: int
+
+    def text(self, documents: Sequence[str]) -> str:
+        return documents[self.source_index][self.start:self.end]
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+class ScoredPassage(NamedTuple):
+    passage: Passage
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens with stopwords removed.
+
+    Args:
+        text: Any text.
+
+    Returns:
+        The list of index/query tokens.
+    """
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def split_passages(text: str, source_index: int, max_chars: int = PASSAGE_MAX_CHARS) -> List[Passage]:
+    """
+    Split one document into passages of at most `max_chars`, preferring paragraph, then
+    sentence, then word boundaries. Transcripts without paragraphs are windowed.
+
+    Args:
+        text: The document text.
+        source_index: Index of the document in the `source_evidence` list.
+        max_chars: Maximum passage length in characters.
+
+    Returns:
+        Passages in document order.
+    """
+    passages: List[Passage] = []
+    n = len(text)
+    start = 0
+    while start < n:
+        while start < n and text[start].isspace():
+            start += 1
+        if start >= n:
+            break
+        end = min(start + max_chars, n)
+        if end < n:
+            window = text[start:end]
+            # Last paragraph break, else last sentence end, else last space in the window.
+            cut = max((m.start() for m in _PARAGRAPH_RE.finditer(window)), default=-1)
+            if cut < max_chars // 2:
+                cut = max((m.end() for m in _SENTENCE_END_RE.finditer(window)), default=-1)
+            if cut < max_chars // 2:
+                cut = window.rfind(" ")
+            if cut > 0:
+                end = start + cut
+        stop = end
+        while stop > start and text[stop - 1].isspace():
+            stop -= 1
+        if stop > start:
+            passages.append(Passage(source_index, start, stop))
+        start = end
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a list of passages, with postings so scoring touches only matching passages."""
+
+    def __init__(self, documents: Sequence[str], passages: List[Passage], k1: float = BM25_K1, b: float = BM25_B):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self._tfs: List[Counter] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for i, passage in enumerate(passages):
+            tf = Counter(tokenize(passage.text(documents)))
+            self._tfs.append(tf)
+            self._lengths.append(sum(tf.values()))
+            for term in tf:
+                self._postings[term].append(i)
+        self._avg_len = (sum(self._lengths) / len(passages)) if passages else 0.0
+
+    def idf(self, term: str) -> float:
+        n, df = len(self.passages), len(self._postings.get(term, ()))
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: Iterable[str]) -> List[ScoredPassage]:
+        """
+        Score passages against a tokenized query (repeated tokens weigh more).
+
+        Args:
+            query: Query tokens, e.g. from `tokenize`.
+
+        Returns:
+            Passages with a positive score, best first.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term, qtf in Counter(query).items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i in postings:
+                tf = self._tfs[i][term]
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_len or 1.0))
+                scores[i] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return [ScoredPassage(self.passages[i], score) for i, score in ranked]
+
+
+def allocate_budget(sizes: Sequence[int], budget: int, weights: Optional[Sequence[float]] = None) -> List[int]:
+    """
+    Share `budget` between sources by weight, max-min fair ("water-filling"): a source never
+    gets more than it has, and whatever it cannot use is redistributed to the others.
+
+    Args:
+        sizes: Available characters per source.
+        budget: Total characters to distribute.
+        weights: Relative share per source (default: equal).
+
+    Returns:
+        Allocated characters per source; the sum never exceeds `budget`.
+    """
+    weights = list(weights) if weights is not None else [1.0] * len(sizes)
+    alloc = [0] * len(sizes)
+    active = [i for i, size in enumerate(sizes) if size > 0 and weights[i] > 0]
+    remaining = budget
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active)
+        capped = [i for i in active if sizes[i] - alloc[i] <= remaining * weights[i] / total_weight]
+        if not capped:
+            for i in active:
+                alloc[i] += int(remaining * weights[i] / total_weight)
+            break
+        for i in capped:
+            remaining -= sizes[i] - alloc[i]
+            alloc[i] = sizes[i]
+            active.remove(i)
+    return alloc
+
+
+def take_prefix(text: str, max_chars: int) -> str:
+    """Return at most `max_chars` leading characters of `text`, cut back to a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars + 1)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip()
+
+
+def select_passages(documents: List[str], query_texts: List[str], budget_chars: int,
+                    separator_chars: int = 0,
+                    source_budgets: Optional[Sequence[int]] = None) -> List[ScoredPassage]:
+    """
+    Pick the highest-scoring passages across all documents that fit in `budget_chars`.
+
+    Args:
+        documents: Source texts, positionally aligned with `source_evidence`.
+        query_texts: Hypothesis description, search terms, etc.
+        budget_chars: Total characters available for passage text.
+        separator_chars: Per-passage overhead (labels/separators) to count against the budget.
+        source_budgets: Optional per-source caps (e.g. from `allocate_budget`); whatever a
+            source leaves unused is then filled with the best remaining passages overall.
+
+    Returns:
+        The selected passages, grouped by source and in document order. Passages that do
+        not match the query at all only fill leftover budget, taken round-robin by source.
+    """
+    per_source = [split_passages(doc, i) for i, doc in enumerate(documents) if doc]
+    passages = [p for group in per_source for p in group]
+    index = BM25Index(documents, passages)
+    query = [t for text in query_texts for t in tokenize(text)]
+
+    ranked = index.search(query)
+    matched = {sp.passage for sp in ranked}
+    leftovers = [p for round_ in itertools.zip_longest(*per_source) for p in round_
+                 if p is not None and p not in matched]
+    ranked += [ScoredPassage(p, 0.0) for p in leftovers]
+
+    chosen: List[ScoredPassage] = []
+    taken = set()
+    used = 0
+    if source_budgets is not None:
+        source_used = [0] * len(documents)
+        for scored in ranked:
+            i, cost = scored.passage.source_index, scored.passage.length + separator_chars
+            if source_used[i] + cost <= source_budgets[i] and used + cost <= budget_chars:
+                chosen.append(scored)
+                taken.add(scored.passage)
+                source_used[i] += cost
+                used += cost
+    for scored in ranked:
+        cost = scored.passage.length + separator_chars
+        if scored.passage in taken or used + cost > budget_chars:
+            continue
+        chosen.append(scored)
+        used += cost
+    chosen.sort(key=lambda sp: (sp.passage.source_index, sp.passage.start))
+    return chosen
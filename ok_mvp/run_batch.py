@@ -0,0 +1,311 @@
+# ok_mvp/run_batch.py
+"""
+Offline bulk mode: run the pipeline for many submissions with batched LLM calls.
+
+Each stage gathers every LLM request for all submissions into one batch file and submits it
+through a batch backend (see batch_utils.py); the run state is saved under BATCH_DIR, so the
+command can exit while a batch is pending and be re-run later to resume:
+
+    hypotheses -> search_terms -> research (source fetch, no LLM) -> map -> synthesis -> done
+
+The map stage only runs with MAP_PIPELINE; its summaries go to the per-source summary cache.
+Stages whose outputs already exist are skipped, so a partly processed batch just fills the gaps.
+
+Usage:
+    python -m ok_mvp.run_batch SUB1 SUB2 ... [--run-name nightly] [--backend local] [--wait]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from openai import OpenAI
+
+from ok_mvp import generate_hypotheses, generate_search_terms, http_utils, podcast_module
+from ok_mvp.batch_utils import (
+    COMPLETED, FAILED, LocalBatchBackend, OpenAIBatchBackend, canned_response, chat_request, write_batch_file,
+)
+from ok_mvp.config import BATCH_BACKEND, BATCH_DIR, BATCH_POLL_INTERVAL, MAP_PIPELINE
+from ok_mvp.cache_utils import get_from_cache, save_to_cache
+from ok_mvp.llm_utils import MAP_PROMPT, build_chat_request, chunk_text, summary_cache_key
+from ok_mvp.run_toolkit_research import (
+    _submission_dir, build_synthesis_request, collect_sources, load_config, save_research_results,
+)
+from ok_mvp.shared_research_utils import SharedResearch
+from ok_mvp.stream_utils import parse_json_response
+
+STAGES = ["hypotheses", "search_terms", "research", "map", "synthesis", "done"]
+HYPOTHESES_PER_SUBMISSION = 3
+MAX_STAGE_ATTEMPTS = 3  # batches per stage before requests that keep failing are given up on
+
+
+def _path(submission_id, name):
+    return os.path.join(_submission_dir(submission_id), name)
+
+
+def _sources_path(submission_id, num):
+    return _path(submission_id, f'hypothesis_{num}_sources.json')
+
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def _summary_key(state, source_url, text):
+    # Map summaries answered by the local batch stand-in are canned text; keep them apart from real ones.
+    return summary_cache_key(source_url, text, "batch-local" if state["backend"] == "local" else "openai")
+
+
+def _pending_hypotheses(submissions, with_sources=False):
+    """(submission_id, hypothesis_num) pairs that exist (and have collected sources, if asked)."""
+    for submission_id in submissions:
+        if os.path.exists(_path(submission_id, 'hypotheses.json')):
+            count = len(_load_json(_path(submission_id, 'hypotheses.json')))
+            for num in range(1, min(count, HYPOTHESES_PER_SUBMISSION) + 1):
+                if not with_sources or os.path.exists(_sources_path(submission_id, num)):
+                    yield submission_id, num
+
+
+# --- Stage request builders: return [batch lines] for outputs that do not exist yet ---
+
+def _hypotheses_requests(submissions, state):
+    lines = []
+    for sub in submissions:
+        if os.path.exists(_path(sub, 'hypotheses.json')):
+            continue
+        if not os.path.exists(_path(sub, 'founder_profile.json')):
+            print(f"  Skipping {sub}: no founder_profile.json (run create_new_profile first).")
+            continue
+        profile = _load_json(_path(sub, 'founder_profile.json'))
+        lines.append(chat_request(f"hypotheses|{sub}", generate_hypotheses.build_request(profile)))
+    return lines
+
+
+def _search_terms_requests(submissions, state):
+    lines = []
+    for sub, num in _pending_hypotheses(submissions):
+        if not os.path.exists(_path(sub, f'hypothesis_{num}_search_terms.json')):
+            hypothesis = _load_json(_path(sub, 'hypotheses.json'))[num - 1]
+            lines.append(chat_request(f"search_terms|{sub}|{num}", generate_search_terms.build_request(hypothesis)))
+    return lines
+
+
+def _map_requests(submissions, state):
+    """Also records each source's chunk count in state["map_chunks"], to tell complete summaries apart."""
+    lines = []
+    chunk_counts = state.setdefault("map_chunks", {})
+    for sub, num in _pending_hypotheses(submissions, with_sources=True):
+        collected = _load_json(_sources_path(sub, num))
+        for i, (source, text) in enumerate(zip(collected["source_evidence"], collected["contents"])):
+            if not text or (source.get("url") and
+                            get_from_cache("summaries", _summary_key(state, source["url"], text))):
+                continue
+            c = -1
+            for c, chunk in enumerate(chunk_text(text)):
+                lines.append(chat_request(f"map|{sub}|{num}|{i}|{c}", build_chat_request(MAP_PROMPT, chunk)))
+            chunk_counts[f"{sub}|{num}|{i}"] = c + 1
+    return lines
+
+
+def _synthesis_requests(submissions, state):
+    lines = []
+    for sub, num in _pending_hypotheses(submissions, with_sources=True):
+        if os.path.exists(_path(sub, f'hypothesis_{num}_research_results.json')):
+            continue
+        collected = _load_json(_sources_path(sub, num))
+        if any(_synthesis_contents(collected)):
+            request, _ = build_synthesis_request(_synthesis_contents(collected), collected["hypothesis"],
+                                                 collected["search_terms"], collected["source_evidence"])
+            lines.append(chat_request(f"synthesis|{sub}|{num}", request))
+        else:
+            save_research_results(sub, num, collected)
+    return lines
+
+
+# --- Stage result handlers ---
+
+def _apply_results(stage, results, state):
+    map_parts = {}
+    for custom_id, content in sorted(results.items()):
+        kind, sub, *rest = custom_id.split("|")
+        if content is None:
+            print(f"  Request {custom_id} failed; it will be resubmitted.")
+            continue
+        try:
+            if kind == "hypotheses":
+                data = generate_hypotheses.coerce_hypotheses(parse_json_response(content))
+                _save_json(_path(sub, 'hypotheses.json'), data)
+            elif kind == "search_terms":
+                data = parse_json_response(content)
+                generate_search_terms.validate_search_terms(data)
+                data = generate_search_terms.finalize_search_terms(data)
+                _save_json(_path(sub, f'hypothesis_{rest[0]}_search_terms.json'), data)
+            elif kind == "map":
+                num, source, chunk = (int(x) for x in rest)
+                map_parts.setdefault((sub, num, source), []).append((chunk, content.strip()))
+            elif kind == "synthesis":
+                num = int(rest[0])
+                collected = _load_json(_sources_path(sub, num))
+                result = parse_json_response(content)
+                _, result["synthesis_budget"] = build_synthesis_request(
+                    _synthesis_contents(collected), collected["hypothesis"], collected["search_terms"],
+                    collected["source_evidence"])
+                save_research_results(sub, num, collected, result)
+        except ValueError as e:  # includes json.JSONDecodeError
+            print(f"  Could not use the answer to {custom_id}: {e}")
+    for (sub, num, source), parts in map_parts.items():
+        collected = _load_json(_sources_path(sub, num))
+        text = collected["contents"][source]
+        answered = {chunk: part for chunk, part in parts if part}
+        # A summary missing a chunk is not cached, so the map stage resubmits the source. Runs
+        # started before chunk counts were recorded have to chunk the text again.
+        chunks = state.get("map_chunks", {}).get(f"{sub}|{num}|{source}")
+        if len(answered) < (chunks if chunks is not None else sum(1 for _ in chunk_text(text))):
+            continue
+        url = collected["source_evidence"][source].get("url")
+        if url:
+            summary = "\n\n".join(answered[chunk] for chunk in sorted(answered))
+            save_to_cache("summaries", _summary_key(state, url, text), summary)
+
+
+async def _research_stage(submissions, config, sources_to_run):
+    """
+    Fetch sources for every hypothesis that has search terms (no LLM calls). Queries shared by
+    several hypotheses (of any submission) run once; returns the sharing report.
+    """
+    shared = SharedResearch()
+    for sub, num in _pending_hypotheses(submissions):
+        if os.path.exists(_sources_path(sub, num)) or \
+                not os.path.exists(_path(sub, f'hypothesis_{num}_search_terms.json')):
+            continue
+        print(f"\n--- Collecting sources for Hypothesis {num} of {sub} ---")
+        collected = await collect_sources(sub, num, config, sources_to_run, map_pipeline=False, shared=shared)
+        _save_json(_sources_path(sub, num), collected)
+    await podcast_module.drain_transcription_jobs()
+    await http_utils.close_async_session()
+    return shared.log_report()
+
+
+def _use_summaries(submissions, state):
+    """
+    After the map stage, store each source's cached summary ("" if missing) under "summaries".
+    The raw text stays in "contents", so a missing summary can still be computed on a later run.
+    """
+    for sub, num in _pending_hypotheses(submissions, with_sources=True):
+        collected = _load_json(_sources_path(sub, num))
+        collected["summaries"] = [
+            (get_from_cache("summaries", _summary_key(state, source["url"], text)) or "")
+            if text and source.get("url") else "" for source, text in zip(collected["source_evidence"],
+                                                                           collected["contents"])
+        ]
+        _save_json(_sources_path(sub, num), collected)
+
+
+def _synthesis_contents(collected):
+    """What a hypothesis is synthesized from: the map summaries if the map stage ran, else the raw text."""
+    return collected.get("summaries", collected["contents"])
+
+
+STAGE_REQUESTS = {"hypotheses": _hypotheses_requests, "search_terms": _search_terms_requests,
+                  "map": _map_requests, "synthesis": _synthesis_requests}
+
+
+def _make_backend(name, config):
+    if name == "local":
+        return LocalBatchBackend(os.path.join(BATCH_DIR, "local"), canned_response)
+    return OpenAIBatchBackend(OpenAI(api_key=config.get("OPENAI_API_KEY")))
+
+
+def run_batch(submissions, run_name, backend_name, sources_to_run, wait):
+    """Advance the bulk run as far as possible; returns the stage it stopped at."""
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    state_path = os.path.join(BATCH_DIR, f"{run_name}.json")
+    state = _load_json(state_path) if os.path.exists(state_path) else \
+        {"submissions": submissions, "backend": backend_name, "stage": STAGES[0], "batch_id": None, "history": []}
+    try:
+        config = load_config()
+    except ValueError as e:
+        if state["backend"] != "local":
+            raise
+        print(f"Configuration incomplete ({e}); continuing with the local backend.")
+        config = {"OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"), "TADDY_API_KEY": os.getenv("TADDY_API_KEY"),
+                  "TADDY_USER_ID": os.getenv("TADDY_USER_ID"), "MAX_RESULTS_PER_SOURCE": 3}
+    backend = _make_backend(state["backend"], config)
+    submissions = state["submissions"]
+
+    while state["stage"] != "done":
+        stage = state["stage"]
+        if state["batch_id"]:
+            status = backend.status(state["batch_id"])
+            if status == FAILED:
+                print(f"Batch {state['batch_id']} for stage '{stage}' failed; resubmitting.")
+                state["batch_id"] = None
+            elif status != COMPLETED:
+                if not wait:
+                    print(f"Batch {state['batch_id']} for stage '{stage}' is still running; re-run to resume.")
+                    break
+                time.sleep(BATCH_POLL_INTERVAL)
+                continue
+            else:
+                _apply_results(stage, backend.results(state["batch_id"]), state)
+                state["history"].append({"stage": stage, "batch_id": state["batch_id"],
+                                         "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+                state["batch_id"] = None
+                attempts = sum(1 for h in state["history"] if h["stage"] == stage)
+                if attempts < MAX_STAGE_ATTEMPTS and STAGE_REQUESTS[stage](submissions, state):
+                    print(f"Some '{stage}' requests did not produce output; submitting them again.")
+                    _save_json(state_path, state)
+                    continue
+                state["stage"] = STAGES[STAGES.index(stage) + 1]
+                _save_json(state_path, state)
+                continue
+        if not state["batch_id"]:
+            if stage == "research":
+                sharing = asyncio.run(_research_stage(submissions, config, sources_to_run))
+                state["history"].append({"stage": stage, "source_queries": sharing,
+                                         "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+                print(f"Source queries: {sharing['requested']} requested, {sharing['executed']} executed, "
+                      f"{sharing['saved']} saved by sharing across submissions.")
+                requests = []
+            elif stage == "map" and not MAP_PIPELINE:
+                requests = []
+            else:
+                if stage == "synthesis" and MAP_PIPELINE:
+                    _use_summaries(submissions, state)
+                requests = STAGE_REQUESTS[stage](submissions, state)
+            if requests:
+                path = write_batch_file(os.path.join(BATCH_DIR, f"{run_name}.{stage}.jsonl"), requests)
+                state["batch_id"] = backend.submit(path)
+                print(f"Submitted {len(requests)} '{stage}' requests as batch {state['batch_id']}.")
+            else:
+                state["stage"] = STAGES[STAGES.index(stage) + 1]
+        _save_json(state_path, state)
+
+    _save_json(state_path, state)
+    http_utils.close_client()
+    print(f"Bulk run '{run_name}' is at stage: {state['stage']}")
+    return state["stage"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the toolkit for many submissions with batched LLM calls.")
+    parser.add_argument("submission_ids", nargs='+', help="Submission IDs to process.")
+    parser.add_argument("--run-name", default=time.strftime("bulk-%Y%m%d"), help="Name of the resumable run.")
+    parser.add_argument("--backend", choices=['openai', 'local'], default=BATCH_BACKEND,
+                        help="Batch backend; 'local' answers with canned JSON for offline runs.")
+    parser.add_argument("--sources", nargs='+', default=['podcast', 'arxiv', 'youtube'],
+                        choices=['podcast', 'arxiv', 'youtube'], help="Sources to research.")
+    parser.add_argument("--wait", action='store_true', help="Poll pending batches instead of exiting.")
+    args = parser.parse_args()
+    run_batch(args.submission_ids, args.run_name, args.backend, args.sources, args.wait)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,32 @@ import json
 import os
 import argparse
 import asyncio
-from openai import OpenAI
 from dotenv import load_dotenv
 
 from ok_mvp import podcast_module
 from ok_mvp import arxiv_module
 from ok_mvp import youtube_module
+from ok_mvp import generate_search_terms
+from ok_mvp import http_utils
+from ok_mvp.config import (
+    SYNTHESIS_MAX_CHARS,
+    SYNTHESIS_RELEVANCE_RANKING,
+    SYNTHESIS_BUDGET_MODE,
+    SYNTHESIS_SOURCE_WEIGHTS,
+    DEDUPE_NEAR_DUPLICATES,
+    MAP_PIPELINE,
+    LLM_STREAM_JSON,
+)
+from ok_mvp.concurrency_utils import chat_completion, get_llm_limiter
+from ok_mvp.llm_backend_utils import backend_needs_api_key, get_llm_client
+from ok_mvp.dedupe_utils import collapse_near_duplicates, expand_evidence_indices
+from ok_mvp.llm_utils import estimate_tokens
+from ok_mvp.pipeline_utils import MapPipeline
+from ok_mvp.prompt_utils import build_messages, register_prompt
+from ok_mvp.shared_research_utils import SharedResearch
+from ok_mvp.stream_utils import parse_json_response, stream_chat_json
+from ok_mvp.usage_utils import llm_usage, write_usage_report
+from ok_mvp.retrieval_utils import allocate_budget, select_passages, take_prefix
 # from ok_mvp import cache_utils # Caching is handled within each module
 
 def load_config():
@@ -19,48 +39,167 @@ def load_config():
     config = {
         "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
         "TADDY_API_KEY": os.getenv("TADDY_API_KEY"),
+        "TADDY_USER_ID": os.getenv("TADDY_USER_ID"),
         "MAX_RESULTS_PER_SOURCE": 3
     }
-    if not all([config["OPENAI_API_KEY"], config["TADDY_API_KEY"]]):
+    if not config["TADDY_API_KEY"] or (backend_needs_api_key() and not config["OPENAI_API_KEY"]):
         raise ValueError("API keys for Taddy and OpenAI must be set in the .env file")
     return config
 
-def synthesize_content(client, content_blobs, hypothesis, search_terms):
-    print("  Synthesizing content with OpenAI...")
-    full_text = "\n\n---\n\n".join(content_blobs)
-    prompt = f"""
+def _source_weights(content_blobs, source_evidence):
+    type_weights = {}
+    for item in filter(None, (w.strip() for w in SYNTHESIS_SOURCE_WEIGHTS.split(","))):
+        name, _, value = item.partition("=")
+        type_weights[name.strip().lower()] = float(value or 1)
+    weights = []
+    for i, blob in enumerate(content_blobs):
+        source_type = (source_evidence[i].get("source_type", "") if source_evidence else "").lower()
+        weight = type_weights.get(source_type, 1.0)
+        weights.append(weight * len(blob) if SYNTHESIS_BUDGET_MODE == "proportional" else weight)
+    return weights
+
+def build_synthesis_text(content_blobs, hypothesis, search_terms, source_evidence=None):
+    """
+    Pick the source text for the synthesis prompt within SYNTHESIS_MAX_CHARS.
+
+    The budget is split between sources first (see allocate_budget), then filled with each
+    source's best BM25 passages, or its leading text when ranking is off. Only the selected
+    text is copied out of the sources.
+
+    Returns (text, report): passages carry [SOURCE n] labels, and `report` holds per-source
+    character/token counts for the results file.
+    """
+    sizes = [len(blob) for blob in content_blobs]
+    labels = [f"[SOURCE {i}] " for i in range(len(content_blobs))]
+    overhead = max(map(len, labels), default=0) + 2
+    # Each source's share has to cover its [SOURCE n] label as well as its text.
+    budgets = allocate_budget([size + overhead if size else 0 for size in sizes], SYNTHESIS_MAX_CHARS,
+                              _source_weights(content_blobs, source_evidence))
+
+    if SYNTHESIS_RELEVANCE_RANKING:
+        query = [hypothesis.get('hypothesis_description', '')] + list(search_terms)
+        selected = select_passages(content_blobs, query, SYNTHESIS_MAX_CHARS,
+                                   separator_chars=overhead, source_budgets=budgets)
+        pieces = [(sp.passage.source_index, sp.passage.text(content_blobs)) for sp in selected]
+        text = "\n\n".join(labels[i] + piece for i, piece in pieces)
+        print(f"  Selected {len(selected)} passages from {len({i for i, _ in pieces})} "
+              f"of {len(content_blobs)} sources (BM25).")
+    else:
+        pieces = [(i, take_prefix(blob, max(0, budgets[i] - overhead)))
+                  for i, blob in enumerate(content_blobs) if budgets[i] > overhead]
+        text = "\n\n".join(labels[i] + piece for i, piece in pieces)
+
+    used = [[] for _ in content_blobs]
+    for i, piece in pieces:
+        used[i].append(piece)
+    report = {
+        "budget_chars": SYNTHESIS_MAX_CHARS,
+        "mode": SYNTHESIS_BUDGET_MODE,
+        "ranking": "bm25" if SYNTHESIS_RELEVANCE_RANKING else "prefix",
+        "sources": [
+            {"index": i, "available_chars": sizes[i], "allocated_chars": budgets[i],
+             "used_chars": sum(map(len, used[i])), "used_tokens": estimate_tokens("\n\n".join(used[i]))}
+            for i in range(len(content_blobs))
+        ],
+    }
+    return text, report
+
+# Static instructions first, then the hypothesis, then the selected passages (cache-friendly order).
+SYNTHESIS_PROMPT = register_prompt("synthesis", 1, """
 # ROLE
 You are a research analyst. Your task is to analyze a collection of raw text from podcasts and academic papers and synthesize the key business opportunities relevant to a specific hypothesis.
 
 # CONTEXT
-The user is exploring the following business hypothesis: "{hypothesis['hypothesis_description']}"
-You have been provided with raw text from several sources related to this topic.
+The user is exploring the business hypothesis given under # HYPOTHESIS.
+You have been provided with raw text from several sources related to this topic, under # RAW TEXT.
 
 # INSTRUCTIONS
 1. Read through all the provided raw text.
 2. Identify 3-5 distinct business ideas, market needs, or strategic insights that are directly relevant to the user's hypothesis.
 3. For each idea, write a concise `idea` title and a `description`.
 4. The output must be a JSON object containing a single key "synthesized_opportunities" which is an array of objects. Do not include any text outside the JSON object.
+5. Each passage of raw text starts with a [SOURCE n] label. For each idea, add `supporting_evidence_indices`: the list of source numbers n that support it.
+""")
 
-# RAW TEXT
----
-{full_text[:12000]}
----
-"""
-    response = client.chat.completions.create(
+def build_synthesis_request(content_blobs, hypothesis, search_terms, source_evidence=None):
+    """Chat completion arguments for the synthesis call, plus the budget report for the results file."""
+    raw_text, budget_report = build_synthesis_text(content_blobs, hypothesis, search_terms, source_evidence)
+    request = dict(
         model="gpt-5-mini",
-        messages=[{"role": "user", "content": prompt}],
+        messages=build_messages(SYNTHESIS_PROMPT,
+                                context=f"# HYPOTHESIS\n{hypothesis['hypothesis_description']}",
+                                content=f"# RAW TEXT\n{raw_text}"),
         response_format={"type": "json_object"}
     )
-    return json.loads(response.choices[0].message.content)
+    return request, budget_report
+
+def synthesize_content(client, content_blobs, hypothesis, search_terms, source_evidence=None,
+                       on_opportunity=None):
+    """
+    Synthesize opportunities for one hypothesis. With LLM_STREAM_JSON the completion is
+    streamed and `on_opportunity` is called with each opportunity as soon as it is complete.
+    """
+    print("  Synthesizing content with OpenAI...")
+    request, budget_report = build_synthesis_request(content_blobs, hypothesis, search_terms, source_evidence)
+    with llm_usage("synthesis"):
+        if LLM_STREAM_JSON:
+            result = stream_chat_json(client, "synthesized_opportunities", on_opportunity, **request)
+        else:
+            response = chat_completion(client, **request)
+            result = parse_json_response(response.choices[0].message.content)
+    result["synthesis_budget"] = budget_report
+    return result
 
-async def run_research_for_hypothesis(submission_id, hypothesis_num, config, sources_to_run):
+def _submission_dir(submission_id):
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    submission_dir = os.path.join(project_root, 'output', submission_id)
+    return os.path.join(project_root, 'output', submission_id)
+
+def _research_modules(sources_to_run):
+    return [(name, module) for name, module in (('podcast', podcast_module), ('arxiv', arxiv_module),
+                                                ('youtube', youtube_module)) if name in sources_to_run]
+
+async def generate_terms_with_prefetch(submission_ids, config, sources_to_run, shared):
+    """
+    Generate search terms for submissions with hypotheses that have none yet. Each hypothesis's
+    source searches start (through `shared`) as soon as its first term streams in, while the model
+    is still writing the rest; collect_sources then joins the searches already in flight.
+    """
+    loop = asyncio.get_running_loop()
+
+    def prefetch(term):
+        for name, module in _research_modules(sources_to_run):
+            shared.prefetch(name, module, [term], config)
+
+    for submission_id in submission_ids:
+        submission_dir = _submission_dir(submission_id)
+        with open(os.path.join(submission_dir, 'hypotheses.json'), 'r') as f:
+            count = len(json.load(f))
+        if all(os.path.exists(os.path.join(submission_dir, f'hypothesis_{num}_search_terms.json'))
+               for num in range(1, count + 1)):
+            continue
+        started = set()
+
+        def on_term(num, term):
+            # Called from the generator's worker threads; the searches run on this loop.
+            if num not in started:
+                started.add(num)
+                loop.call_soon_threadsafe(prefetch, term)
+
+        await asyncio.to_thread(generate_search_terms.generate_terms_for_hypotheses, submission_id, on_term)
+
+async def collect_sources(submission_id, hypothesis_num, config, sources_to_run, map_pipeline=MAP_PIPELINE,
+                          shared=None):
+    """
+    Fetch and prepare the sources for one hypothesis.
+
+    Returns a dict with the hypothesis, its search terms, the indexed `source_evidence` and the
+    aligned `contents` to synthesize from: per-source map summaries when `map_pipeline` is on,
+    otherwise the raw text with near-duplicates collapsed. With a `shared` SharedResearch, queries
+    already run for another hypothesis of the run are answered from its results.
+    """
+    submission_dir = _submission_dir(submission_id)
     search_terms_path = os.path.join(submission_dir, f'hypothesis_{hypothesis_num}_search_terms.json')
-    results_path = os.path.join(submission_dir, f'hypothesis_{hypothesis_num}_research_results.json')
-    print(f"\n--- Processing Hypothesis {hypothesis_num} for Submission ID: {submission_id} ---")
-    
+
     with open(search_terms_path, 'r') as f:
         search_terms = json.load(f).get('search_terms', [])
     
@@ -70,50 +209,121 @@ async def run_research_for_hypothesis(submission_id, hypothesis_num, config, sou
 
     all_source_evidence, all_content_for_synthesis = [], []
 
-    if 'podcast' in sources_to_run:
-        podcast_sources, podcast_content = await podcast_module.research(search_terms, config)
-        all_source_evidence.extend(podcast_sources)
-        all_content_for_synthesis.extend(podcast_content)
-    if 'arxiv' in sources_to_run:
-        arxiv_sources, arxiv_content = await arxiv_module.research(search_terms, config)
-        all_source_evidence.extend(arxiv_sources)
-        all_content_for_synthesis.extend(arxiv_content)
-    if 'youtube' in sources_to_run:
-        youtube_sources, youtube_content = await youtube_module.research(search_terms, config)
-        all_source_evidence.extend(youtube_sources)
-        all_content_for_synthesis.extend(youtube_content)
+    # With the map pipeline on, each source is summarized as soon as its module hands it over.
+    pipeline = MapPipeline() if map_pipeline else None
+    on_source = pipeline.submit if pipeline else None
+    modules = _research_modules(sources_to_run)
+    if shared is not None:
+        requester = f"{submission_id}#{hypothesis_num}"
+        runs = [shared.research(name, module, search_terms, config, on_source, requester) for name, module in modules]
+    else:
+        runs = [module.research(search_terms, config, on_source) for _, module in modules]
+    try:
+        results = await asyncio.gather(*runs)
+    except BaseException:
+        # The hypothesis has failed: stop summarizing its sources rather than spend LLM calls on them.
+        if pipeline:
+            pipeline.close()
+        raise
+    for module_sources, module_content in results:
+        all_source_evidence.extend(module_sources)
+        all_content_for_synthesis.extend(module_content)
 
     print(f"  Aggregated {len(all_source_evidence)} sources for synthesis.")
     
     for i, source in enumerate(all_source_evidence):
         source['index'] = i
-    
-    if all_content_for_synthesis:
-        openai_client = OpenAI(api_key=config["OPENAI_API_KEY"])
-        synthesis_result = synthesize_content(openai_client, all_content_for_synthesis, current_hypothesis, search_terms)
-        final_output = {**synthesis_result, "source_evidence": all_source_evidence}
+
+    if pipeline:
+        await pipeline.finish()
+        for source in all_source_evidence:
+            original = pipeline.duplicate_of(source)
+            if original is not None:
+                source['duplicate_of'] = original['index']
+        all_content_for_synthesis = [pipeline.summary_for(source) for source in all_source_evidence]
+    elif DEDUPE_NEAR_DUPLICATES and all_content_for_synthesis:
+        all_content_for_synthesis = collapse_near_duplicates(all_source_evidence, all_content_for_synthesis)
+
+    return {"hypothesis": current_hypothesis, "search_terms": search_terms,
+            "source_evidence": all_source_evidence, "contents": all_content_for_synthesis}
+
+def save_research_results(submission_id, hypothesis_num, collected, synthesis_result=None, synthesis_error=None):
+    """
+    Write hypothesis_N_research_results.json from collected sources and the synthesis output (if any).
+    A `synthesis_error` is recorded so a failed synthesis can be told apart from having no sources.
+    """
+    source_evidence, search_terms = collected["source_evidence"], collected["search_terms"]
+    if synthesis_result is not None:
+        expand_evidence_indices(synthesis_result.get("synthesized_opportunities", []), source_evidence)
+        final_output = {**synthesis_result, "source_evidence": source_evidence}
     else:
-        final_output = {"search_topic": search_terms[0] if search_terms else "N/A", "synthesized_opportunities": [], "source_evidence": all_source_evidence}
+        final_output = {"search_topic": search_terms[0] if search_terms else "N/A", "synthesized_opportunities": [], "source_evidence": source_evidence}
+        if synthesis_error:
+            final_output["synthesis_error"] = synthesis_error
 
+    results_path = os.path.join(_submission_dir(submission_id), f'hypothesis_{hypothesis_num}_research_results.json')
     with open(results_path, 'w') as f:
         json.dump(final_output, f, indent=2)
     print(f"Successfully saved final research results to: {results_path}")
+
+async def run_research_for_hypothesis(submission_id, hypothesis_num, config, sources_to_run, shared=None):
+    print(f"\n--- Processing Hypothesis {hypothesis_num} for Submission ID: {submission_id} ---")
+    # LLM calls made for this hypothesis (map steps in the pipeline workers included) are
+    # attributed to the submission in its usage report.
+    with llm_usage(submission_id=submission_id):
+        collected = await collect_sources(submission_id, hypothesis_num, config, sources_to_run, shared=shared)
+
+        synthesis_result = synthesis_error = None
+        if any(collected["contents"]):
+            # The call runs in a thread so the hypotheses synthesize concurrently (within the LLM limiter).
+            openai_client = get_llm_client(config["OPENAI_API_KEY"])
+            try:
+                synthesis_result = await asyncio.to_thread(
+                    synthesize_content, openai_client, collected["contents"], collected["hypothesis"],
+                    collected["search_terms"], collected["source_evidence"])
+            except Exception as e:
+                # Only this hypothesis fails; its sources are still saved.
+                print(f"  Synthesis failed for Hypothesis {hypothesis_num}: {e}")
+                synthesis_error = str(e)
+
+    save_research_results(submission_id, hypothesis_num, collected, synthesis_result, synthesis_error)
     print(f"--- Finished Hypothesis {hypothesis_num} ---")
 
 async def main():
-    parser = argparse.ArgumentParser(description="Run the research toolkit for a given submission.")
-    parser.add_argument("submission_id", help="The submission ID to process.")
+    parser = argparse.ArgumentParser(description="Run the research toolkit for one or more submissions.")
+    parser.add_argument("submission_ids", nargs='+',
+                        help="The submission IDs to process; their overlapping source queries run once.")
     parser.add_argument("--sources", nargs='+', default=['podcast', 'arxiv', 'youtube'], 
                         choices=['podcast', 'arxiv', 'youtube'], 
                         help="Specify which sources to run. Default is all.")
+    parser.add_argument("--generate-terms", action='store_true',
+                        help="Generate missing search terms first, starting source searches as terms stream in.")
     args = parser.parse_args()
     
     try:
         configuration = load_config()
-        tasks = [run_research_for_hypothesis(args.submission_id, i, configuration, args.sources) for i in range(1, 4)]
-        await asyncio.gather(*tasks)
+        shared = SharedResearch()
+        if args.generate_terms:
+            await generate_terms_with_prefetch(args.submission_ids, configuration, args.sources, shared)
+        runs = [(submission_id, i) for submission_id in args.submission_ids for i in range(1, 4)]
+        tasks = [run_research_for_hypothesis(submission_id, i, configuration, args.sources, shared)
+                 for submission_id, i in runs]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for (submission_id, i), result in zip(runs, results):
+            if isinstance(result, Exception):
+                print(f"Hypothesis {i} of {submission_id} failed: {result}")
+        await podcast_module.drain_transcription_jobs()
+        sharing = shared.log_report()
+        print(f"Source queries: {sharing['requested']} requested, {sharing['executed']} executed, "
+              f"{sharing['saved']} saved by sharing across hypotheses.")
+        print(f"LLM calls: {get_llm_limiter().metrics()}")
+        for submission_id in args.submission_ids:
+            write_usage_report(submission_id, _submission_dir(submission_id))
     except ValueError as e:
         print(f"Configuration Error: {e}")
+    finally:
+        http_utils.close_client()
+        await http_utils.close_async_session()
 
 if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,129 @@
+# ok_mvp/shared_research_utils.py
+"""
+Cross-submission reuse of source queries.
+
+Founders in one batch often get overlapping hypotheses, and so send the same query (or a
+reworded one) to the same provider. A `SharedResearch` is handed to `collect_sources` for every
+hypothesis of a run; each (source, normalized query, result count) is then researched once and
+its sources fanned out to every hypothesis that asked for it, including to their map pipelines
+as the items arrive. Queries only match when they are the same words in the same order, ignoring
+case, punctuation and spacing ("AI-caregiver app" and "ai caregiver  app"): the provider runs
+the first requester's wording, so a looser match would answer one founder's query with another's
+results. Stemmed near-synonyms are merged earlier, within a hypothesis (see term_utils).
+
+Each requester gets its own copies of the evidence dicts, because collect_sources numbers them
+per hypothesis. `prefetch()` starts a query before anyone asks for it (e.g. as soon as a
+hypothesis's first search term streams in), and `report()` says how many provider calls were
+requested and how many were saved.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger()
+
+
+class _SharedQuery:
+    def __init__(self, source: str, query: str):
+        self.source = source
+        self.query = query
+        self.items: List[Tuple[dict, str]] = []
+        self.listeners: List[Callable[[dict, str], None]] = []
+        self.requesters: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def emit(self, evidence: dict, text: str) -> None:
+        self.items.append((evidence, text))
+        for listener in list(self.listeners):
+            listener(evidence, text)
+
+
+class SharedResearch:
+    """Runs each distinct provider query once per run and fans its results out to every requester."""
+
+    def __init__(self):
+        self._queries: Dict[tuple, _SharedQuery] = {}
+
+    @staticmethod
+    def _key(source: str, search_terms: List[str], config: dict) -> tuple:
+        # Modules search with the first term only; the result count changes what they return.
+        query = " ".join(re.findall(r"\w+", search_terms[0].lower()))
+        return source, query, config.get("MAX_RESULTS_PER_SOURCE", 3)
+
+    async def research(self, source: str, module, search_terms: List[str], config: dict,
+                       on_source: Optional[Callable[[dict, str], None]] = None, requester: str = "") -> tuple:
+        """
+        Same contract as `module.research(search_terms, config, on_source)`: returns
+        (source_evidence, contents), calling `on_source` for each source as it arrives.
+        """
+        if not search_terms or not search_terms[0].strip():
+            return await module.research(search_terms, config, on_source)
+
+        shared, started = self._start(source, module, search_terms, config)
+        if not started and shared.requesters:
+            logger.info(f"[Shared] Reusing {source} results for '{shared.query}' ({requester or 'requester'} "
+                        f"asked for '{search_terms[0]}').")
+        shared.requesters.append(requester)
+
+        copies: Dict[int, dict] = {}
+
+        def deliver(evidence: dict, text: str) -> None:
+            copy = copies.setdefault(id(evidence), dict(evidence))
+            if on_source:
+                on_source(copy, text)
+
+        # Items that arrived before this requester joined are replayed; the rest are delivered live.
+        for evidence, text in shared.items:
+            deliver(evidence, text)
+        shared.listeners.append(deliver)
+        try:
+            source_evidence, contents = await asyncio.shield(shared.task)
+        finally:
+            shared.listeners.remove(deliver)
+        return [copies.setdefault(id(e), dict(e)) for e in source_evidence], list(contents)
+
+    def _start(self, source: str, module, search_terms: List[str], config: dict) -> Tuple[_SharedQuery, bool]:
+        """The shared query for these terms, started now unless it already was (and whether it was started)."""
+        key = self._key(source, search_terms, config)
+        shared = self._queries.get(key)
+        if shared is not None:
+            return shared, False
+        shared = self._queries[key] = _SharedQuery(source, search_terms[0])
+        shared.task = asyncio.ensure_future(module.research(search_terms, config, shared.emit))
+        # A prefetch nobody asks for would otherwise leave its exception unretrieved.
+        shared.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return shared, True
+
+    def prefetch(self, source: str, module, search_terms: List[str], config: dict) -> None:
+        """Start researching `search_terms` now, for requesters that will ask for them later."""
+        if search_terms and search_terms[0].strip():
+            self._start(source, module, search_terms, config)
+
+    def report(self) -> dict:
+        """Provider calls requested vs. executed (per source), and the queries that were shared."""
+        by_source: Dict[str, dict] = {}
+        for shared in self._queries.values():
+            row = by_source.setdefault(shared.source, {"requested": 0, "executed": 0, "saved": 0,
+                                                       "unused_prefetches": 0})
+            row["requested"] += len(shared.requesters)
+            row["executed"] += 1
+            row["saved"] += max(len(shared.requesters) - 1, 0)
+            row["unused_prefetches"] += 0 if shared.requesters else 1
+        totals = {field: sum(row[field] for row in by_source.values())
+                  for field in ("requested", "executed", "saved", "unused_prefetches")}
+        return {
+            **totals,
+            "by_source": by_source,
+            "shared_queries": [{"source": s.source, "query": s.query, "requesters": s.requesters}
+                               for s in self._queries.values() if len(s.requesters) > 1],
+        }
+
+    def log_report(self) -> dict:
+        report = self.report()
+        logger.info(f"[Shared] {report['requested']} source queries requested, {report['executed']} executed, "
+                    f"{report['saved']} provider calls saved.")
+        return report
@@ -0,0 +1,212 @@
+# ok_mvp/stream_utils.py
+"""
+Streaming chat completions with incremental JSON parsing.
+
+The scripts ask the model for a JSON array (hypotheses) or an object holding one
+(`search_terms`, `synthesized_opportunities`). `JSONArrayStream` is fed the streamed
+deltas and hands back each array element the moment its closing brace or quote arrives,
+so callers can act on the first item while the model is still writing the rest.
+`parse_json_response` does the final parse and recovers from markdown fences, prose
+around the JSON, and output truncated mid-element.
+"""
+from __future__ import annotations
+
+import json
+import re
+import time
+from typing import Any, Callable, List, Optional
+
+from .concurrency_utils import get_llm_limiter
+from .logger import get_logger
+from .usage_utils import record_llm_call
+
+logger = get_logger()
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|\Z)", re.DOTALL)
+
+
+class JSONArrayStream:
+    """
+    Incremental scanner for one JSON array inside a growing text.
+
+    Args:
+        key: Parse the array stored under this key (at any depth); None parses the first
+            array in the text. Anything before it (fences, prose) is ignored.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key_pending = False
+        self._array_depth: Optional[int] = None  # depth of the target array's elements
+        self._elem_start: Optional[int] = None
+
+    def feed(self, delta: str) -> List[Any]:
+        """Add streamed text; returns the array elements completed by it, in order."""
+        self._text += delta
+        items: List[Any] = []
+        text, n = self._text, len(self._text)
+        while self._pos < n and not self.done:
+            i, c = self._pos, text[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._elem_start is not None and self._depth == self._array_depth \
+                            and text[self._elem_start] == '"':
+                        self._emit(self._elem_start, i + 1, items)
+                    else:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._depth == self._array_depth and self._elem_start is None:
+                    self._elem_start = i
+            elif c in "{[":
+                if self._array_depth is None and c == "[" and (self.key is None or self._key_pending):
+                    self._array_depth = self._depth + 1
+                elif self._depth == self._array_depth and self._elem_start is None:
+                    self._elem_start = i
+                self._key_pending = False
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if self._depth == self._array_depth - 1:
+                        if self._elem_start is not None:  # trailing scalar element
+                            self._emit(self._elem_start, i, items)
+                        self.done = True
+                    elif self._depth == self._array_depth and self._elem_start is not None:
+                        self._emit(self._elem_start, i + 1, items)
+            elif c == ":":
+                self._key_pending = self.key is not None and self._last_string == self.key
+            elif c == ",":
+                self._key_pending = False
+                if self._depth == self._array_depth and self._elem_start is not None:
+                    self._emit(self._elem_start, i, items)
+            elif not c.isspace() and self._depth == self._array_depth and self._elem_start is None:
+                self._elem_start = i  # number / true / false / null element
+        return items
+
+    def _emit(self, start: int, end: int, items: List[Any]) -> None:
+        self._elem_start = None
+        try:
+            items.append(json.loads(self._text[start:end]))
+        except json.JSONDecodeError:
+            logger.warning(f"[Stream] Skipping unparsable array element: {self._text[start:end][:80]!r}")
+
+
+def _close_truncated(text: str) -> str:
+    """Cut `text` back to its last complete value and close the open brackets."""
+    stack: List[str] = []
+    safe, safe_stack = 0, ""
+    in_string = escape = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+                if stack and stack[-1] == "]":  # a complete string element of an array
+                    safe, safe_stack = i + 1, "".join(stack)
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            if c == "[":
+                safe, safe_stack = i + 1, "".join(stack)
+        elif c in "}]" and stack:
+            stack.pop()
+            safe, safe_stack = i + 1, "".join(stack)
+    return text[:safe].rstrip().rstrip(",") + safe_stack[::-1]
+
+
+def parse_json_response(text: str) -> Any:
+    """
+    Parse a model's JSON answer, tolerating ```json fences, surrounding prose and
+    truncation (incomplete trailing elements are dropped).
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be recovered.
+    """
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    text = text[min(starts):] if starts else text
+    try:
+        return json.JSONDecoder().raw_decode(text)[0]
+    except json.JSONDecodeError:
+        repaired = _close_truncated(text)
+        value = json.JSONDecoder().raw_decode(repaired)[0]
+        logger.warning("[Stream] Recovered JSON from a truncated response.")
+        return value
+
+
+def stream_chat_json(client, key: Optional[str] = None, on_item: Optional[Callable[[Any], None]] = None,
+                     **create_kwargs) -> Any:
+    """
+    Run a streamed chat completion and parse its JSON answer incrementally.
+
+    Args:
+        client: An OpenAI client.
+        key: Key of the array to stream items from (None: the top-level array).
+        on_item: Called with each array element as soon as it is complete.
+        **create_kwargs: Passed to `client.chat.completions.create` (model, messages, ...).
+
+    Returns:
+        The full parsed response (see `parse_json_response`).
+
+    The call runs through the shared LLM limiter (see concurrency_utils) and its usage is
+    recorded (see usage_utils).
+    """
+    emitted = 0
+    started = time.perf_counter()
+    measured = {"ttft": None, "usage": None}
+
+    def attempt() -> str:
+        # A retried stream starts over; items the caller already has are not emitted again.
+        nonlocal emitted
+        stream, parts, seen = JSONArrayStream(key), [], 0
+        attempt_started = time.perf_counter()
+        for chunk in client.chat.completions.create(stream=True, stream_options={"include_usage": True},
+                                                    **create_kwargs):
+            if getattr(chunk, "usage", None):
+                measured["usage"] = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not parts:
+                measured["ttft"] = time.perf_counter() - attempt_started
+            parts.append(delta)
+            for item in stream.feed(delta):
+                seen += 1
+                if seen > emitted:
+                    emitted = seen
+                    if on_item:
+                        on_item(item)
+        return "".join(parts)
+
+    # The whole stream holds one limiter slot; throttles and server errors are retried.
+    try:
+        text = get_llm_limiter().call(attempt)
+    except Exception as e:
+        record_llm_call(create_kwargs, None, time.perf_counter() - started, error=e)
+        raise
+    record_llm_call(create_kwargs, measured["usage"], time.perf_counter() - started, measured["ttft"], text)
+    return parse_json_response(text)
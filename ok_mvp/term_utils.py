@@ -0,0 +1,122 @@
+# ok_mvp/term_utils.py
+"""
+Search-term normalization and clustering.
+
+The LLM's 10-15 search terms often include near-synonyms ("AI caregiver app" and "caregiving AI
+application"), and every query a provider is sent costs a search round-trip. Terms are reduced to
+a set of normalized tokens (stopwords dropped, a few abbreviations expanded, light suffix
+stemming that never rewrites a bare word, so "care" and "car" stay apart), then clustered with
+complete linkage on token-set Jaccard similarity: two clusters only merge if every pair of their
+terms is similar, so a chain of small rewordings cannot collapse distinct topics. Each cluster is
+queried once, through its most central term.
+"""
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, List
+
+from .config import SEARCH_TERM_SIMILARITY
+from .logger import get_logger
+from .retrieval_utils import tokenize
+
+logger = get_logger()
+
+# Abbreviations and spellings folded onto one form before stemming.
+_SYNONYMS = {
+    "app": "application", "apps": "application", "ml": "machine learning", "llm": "large language model",
+    "llms": "large language model", "genai": "generative ai",
+    "saas": "software service", "b2b": "business", "b2c": "consumer", "iot": "internet things",
+    "healthcare": "health care", "ecommerce": "e commerce",
+}
+_PHRASES = {"artificial intelligence": "ai"}
+# Longest first, so "ation" is tried before "er"; only stripped where at least 4 letters remain
+# ("caring" stays, rather than becoming "car").
+_SUFFIXES = ("ation", "ing", "er", "ed", "ly")
+
+
+def _singular(token: str) -> str:
+    # S-stemmer plural rules: "companies" -> "company", "services" -> "service", "apps" -> "app".
+    if token.endswith("ies") and not token.endswith(("eies", "aies")) and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("es") and not token.endswith(("aes", "ees", "oes")) and len(token) > 3:
+        return token[:-1]
+    if token.endswith("s") and not token.endswith(("us", "ss")) and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def _stem(token: str) -> str:
+    token = _singular(token)
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+
+def term_key(term: str) -> FrozenSet[str]:
+    """Normalized token set of a search term ("AI caregiver apps" -> {"ai", "caregiv", "applic"})."""
+    term = term.lower()
+    for phrase, replacement in _PHRASES.items():
+        term = term.replace(phrase, replacement)
+    tokens = []
+    for token in tokenize(term):
+        tokens.extend(_SYNONYMS.get(token, token).split())
+    return frozenset(_stem(t) for t in tokens)
+
+
+def term_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two normalized token sets (0.0 if either is empty: nothing to compare)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_terms(terms: List[str], threshold: float = SEARCH_TERM_SIMILARITY) -> List[Dict[str, object]]:
+    """
+    Group redundant search terms.
+
+    Args:
+        terms: Search terms in the model's order (exact duplicates after normalization are merged).
+        threshold: Minimum Jaccard similarity between every pair of terms in a cluster.
+
+    Returns:
+        [{"query": representative, "terms": [members]}] in order of each cluster's first term;
+        the representative is the first term for its cluster, otherwise the member most similar
+        to the rest (earliest on ties).
+    """
+    keys = [term_key(t) for t in terms]
+    clusters: List[List[int]] = [[i] for i in range(len(terms))]
+    sim = [[term_similarity(keys[i], keys[j]) for j in range(len(terms))] for i in range(len(terms))]
+    while True:
+        best, pair = threshold, None
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                link = min(sim[i][j] for i in clusters[a] for j in clusters[b])
+                if link >= best and (pair is None or link > best):
+                    best, pair = link, (a, b)
+        if pair is None:
+            break
+        a, b = pair
+        clusters[a] = sorted(clusters[a] + clusters.pop(b))
+    result = []
+    for members in sorted(clusters, key=lambda m: m[0]):
+        # The first term stays first: it is the model's primary query, which the providers search
+        # with (and which may already be in flight, see run_toolkit_research).
+        center = 0 if members[0] == 0 else max(members, key=lambda i: (sum(sim[i][j] for j in members), -i))
+        result.append({"query": terms[center], "terms": [terms[i] for i in members]})
+    return result
+
+
+def cluster_search_terms(search_terms_data: dict, threshold: float = SEARCH_TERM_SIMILARITY) -> dict:
+    """
+    Replace a {"search_terms": [...]} answer's terms with one query per cluster, keeping the
+    original list under "original_search_terms" and the mapping under "term_clusters".
+    Already clustered data is returned unchanged.
+    """
+    if "term_clusters" in search_terms_data:
+        return search_terms_data
+    terms = [t for t in search_terms_data.get("search_terms", []) if isinstance(t, str) and t.strip()]
+    clusters = cluster_terms(terms, threshold)
+    if len(clusters) < len(terms):
+        logger.info(f"[Terms] Collapsed {len(terms)} search terms into {len(clusters)} queries.")
+    return {**search_terms_data, "search_terms": [c["query"] for c in clusters],
+            "original_search_terms": terms, "term_clusters": clusters}
@@ -1,6 +1,10 @@
 # ok_mvp/text_utils.py
+import codecs
+import functools
+import itertools
 import re
-from typing import List
+from collections import Counter, deque
+from typing import IO, Iterable, Iterator, List, Union
 
 def sanitize_filename(name: str, max_len: int = 240) -> str:
     """Sanitize a string so it’s safe as a filename on most filesystems."""
@@ -11,20 +15,46 @@ def sanitize_filename(name: str, max_len: int = 240) -> str:
         name = name[:max_len].rstrip()
     return name or "transcript"
 
+_BRACKETED_RE = re.compile(r"\[.*?\]|\(.*?\)")
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_SPACES_RE = re.compile(r"\s+")
+_STAGE_TAG_RE = re.compile(r"(?i)\s*(\[[^\]]+\]|\([^)]+\))\s*")
+_EXCESS_BLANKS_RE = re.compile(r"\n{3,}")
+
+@functools.lru_cache(maxsize=8192)
 def normalize_for_compare(s: str) -> str:
+    # Cached: caption tracks repeat the same lines over and over.
     s = s.lower()
-    s = re.sub(r"\[.*?\]|\(.*?\)", "", s)
-    s = re.sub(r"[^\w\s']+", "", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _BRACKETED_RE.sub("", s)
+    s = _PUNCT_RE.sub("", s)
+    s = _SPACES_RE.sub(" ", s).strip()
     return s
 
 def strip_stage_tags(line: str) -> str:
-    line = re.sub(r"(?i)\s*(\[[^\]]+\]|\([^)]+\))\s*", " ", line)
-    return re.sub(r"\s+", " ", line).strip()
+    line = _STAGE_TAG_RE.sub(" ", line)
+    return _SPACES_RE.sub(" ", line).strip()
+
+def _overlap_len(prev_words: List[str], words: List[str], min_overlap: int) -> int:
+    """Longest k >= min_overlap such that the last k of prev_words equal the first k of words."""
+    for k in range(min(len(prev_words), len(words)), min_overlap - 1, -1):
+        if prev_words[-k:] == words[:k]:
+            return k
+    return 0
 
-def dedupe_with_window(lines: List[str], window: int, strip_tags: bool) -> List[str]:
-    out: List[str] = []
-    recent_norms: List[str] = []
+def iter_deduped(lines: Iterable[str], window: int = 3, strip_tags: bool = False,
+                 rolling_overlap: int = 0) -> Iterator[str]:
+    """
+    Stream lines, dropping any whose normalized form was among the last `window` kept lines.
+
+    The window is a fixed-size ring plus a counted set, so each line costs O(1) regardless
+    of the window size. With `rolling_overlap` > 0, a line that repeats at least that many
+    words from the end of the previous caption line (YouTube's progressive captions) only
+    contributes its new words; a line fully contained in that overlap is dropped.
+    """
+    size = max(1, window)
+    ring: deque = deque()
+    counts: Counter = Counter()
+    prev_words: List[str] = []
     for raw in lines:
         line = raw.strip()
         if not line:
@@ -34,25 +64,148 @@ def dedupe_with_window(lines: List[str], window: int, strip_tags: bool) -> List[
             if not line:
                 continue
         norm = normalize_for_compare(line)
-        if norm and norm not in recent_norms:
-            out.append(line)
-            recent_norms.append(norm)
-            if len(recent_norms) > max(1, window):
-                recent_norms.pop(0)
-    return out
-
-def finalize_text(lines: List[str], window: int = 3, strip_tags: bool = False) -> str:
-    """Common finalizer: dedupe + collapse excess blank lines."""
-    lines = dedupe_with_window(lines, window, strip_tags)
-    text = "\n".join(lines)
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
-
-def vtt_to_text(vtt: str, window: int = 3, strip_tags: bool = False) -> str:
-    vtt = re.sub(r"^\ufeff?WEBVTT.*?\n+", "", vtt, flags=re.IGNORECASE | re.DOTALL)
-    vtt = re.sub(r"(?m)^NOTE.*?(?:\n\n|\Z)", "", vtt, flags=re.DOTALL)
-    vtt = re.sub(r"(?m)^STYLE.*?(?:\n\n|\Z)", "", vtt, flags=re.DOTALL)
-    vtt = re.sub(r"\d{2}:\d{2}:\d{2}\.\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}.*", "", vtt)
-    vtt = re.sub(r"(?m)^\d+\s*$", "", vtt)
-    vtt = re.sub(r"<[^>]+>", "", vtt)
-    lines = [ln.strip() for ln in vtt.splitlines() if ln.strip()]
-    return finalize_text(lines, window=window, strip_tags=strip_tags)
\ No newline at end of file
+        if not norm or norm in counts:
+            continue
+        if rolling_overlap > 0:
+            words = line.split()
+            norm_words = [normalize_for_compare(w) for w in words]
+            k = _overlap_len(prev_words, norm_words, rolling_overlap)
+            prev_words = norm_words
+            if k:
+                line = " ".join(words[k:])
+                norm = normalize_for_compare(line)
+                if not norm or norm in counts:
+                    continue
+        yield line
+        if len(ring) == size:
+            old = ring.popleft()
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+        ring.append(norm)
+        counts[norm] += 1
+
+def dedupe_with_window(lines: Iterable[str], window: int, strip_tags: bool) -> List[str]:
+    return list(iter_deduped(lines, window, strip_tags))
+
+def finalize_text(lines: Iterable[str], window: int = 3, strip_tags: bool = False,
+                  rolling_overlap: int = 0) -> str:
+    """Common finalizer: dedupe + collapse excess blank lines. Consumes `lines` lazily."""
+    text = "\n".join(iter_deduped(lines, window, strip_tags, rolling_overlap))
+    if "\n\n\n" in text:
+        text = _EXCESS_BLANKS_RE.sub("\n\n", text)
+    return text.strip()
+
+_VTT_HEADER_RE = re.compile(r"\ufeff?WEBVTT", re.IGNORECASE)
+_VTT_TIMESTAMP_RE = re.compile(r"\d{2}:\d{2}:\d{2}\.\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}")
+_VTT_CUE_NUMBER_RE = re.compile(r"\d+\s*")
+_VTT_TAG_RE = re.compile(r"<[^>]+>")
+# Characters besides "\n" that str.splitlines() treats as line boundaries.
+_LINE_BREAKS = "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+def _iter_raw_lines(vtt: Union[str, bytes, IO]) -> Iterator[str]:
+    """Yield "\n"-separated lines from text, bytes, or a text/binary stream without copying the whole input."""
+    if isinstance(vtt, bytes):
+        vtt = vtt.decode("utf-8", errors="replace")
+    if isinstance(vtt, str):
+        start = 0
+        while True:
+            end = vtt.find("\n", start)
+            if end == -1:
+                yield vtt[start:]
+                return
+            yield vtt[start:end]
+            start = end + 1
+    decoder = None
+    last = ""
+    for chunk in vtt:
+        if isinstance(chunk, bytes):
+            decoder = decoder or codecs.getincrementaldecoder("utf-8")(errors="replace")
+            chunk = decoder.decode(chunk)
+        # Streams may yield lines (with their "\n") or arbitrary chunks; re-split on "\n" only.
+        parts = (last + chunk).split("\n")
+        last = parts.pop()
+        yield from parts
+    if decoder is not None:
+        last += decoder.decode(b"", final=True)
+    yield last
+
+def iter_vtt_lines(vtt: Union[str, bytes, IO]) -> Iterator[str]:
+    """
+    Stream cleaned caption lines out of a WebVTT document in a single pass.
+
+    Accepts text, bytes, or a text/binary stream (e.g. a file or response body) and yields
+    the stripped, non-empty lines that `vtt_to_text` dedupes, without building the cleaned
+    document in memory. Output matches the former whole-string regex passes exactly:
+    header, NOTE and STYLE blocks, cue timings and cue numbers are dropped, and <...> tags
+    are removed (a tag spanning lines joins the text around it).
+    """
+    lines = _iter_raw_lines(vtt)
+    first = next(lines, None)
+    if first is None:
+        return
+    second = next(lines, None)
+    if second is not None and _VTT_HEADER_RE.match(first):
+        # Header line plus the blank lines right after it.
+        while second == "":
+            second = next(lines, None)
+        head = [] if second is None else [second]
+    else:
+        head = [first] if second is None else [first, second]
+
+    skip_note = skip_style = False
+    prefix, pending = "", None  # pending: raw text from a '<' whose '>' is on a later line
+    for line in itertools.chain(head, lines):
+        # NOTE / STYLE blocks run up to and including the next empty line.
+        if skip_note:
+            skip_note = line != ""
+            continue
+        if line.startswith("NOTE"):
+            skip_note = True
+            continue
+        if skip_style:
+            skip_style = line != ""
+            continue
+        if line.startswith("STYLE"):
+            skip_style = True
+            continue
+
+        if "-->" in line:
+            m = _VTT_TIMESTAMP_RE.search(line)
+            if m:
+                line = line[:m.start()]
+        if line[:1].isdigit() and _VTT_CUE_NUMBER_RE.fullmatch(line):
+            continue
+
+        if pending is not None:
+            close = line.find(">")
+            if close == -1:
+                pending += "\n" + line
+                continue
+            pending, line = None, line[close + 1:]
+        if "<" in line:
+            open_at = line.find("<", line.rfind(">") + 1)
+            if open_at != -1:
+                prefix += _VTT_TAG_RE.sub("", line[:open_at])
+                pending = line[open_at:]
+                continue
+            line = _VTT_TAG_RE.sub("", line)
+        if prefix:
+            line, prefix = prefix + line, ""
+
+        line = line.strip()
+        if not line:
+            continue
+        if any(ch in line for ch in _LINE_BREAKS):
+            yield from (ln.strip() for ln in line.splitlines() if ln.strip())
+        else:
+            yield line
+
+    if pending is not None:
+        # Unclosed '<': nothing after it can be a tag, so the text is kept verbatim.
+        yield from (ln.strip() for ln in (prefix + pending).splitlines() if ln.strip())
+
+def vtt_to_text(vtt: Union[str, bytes, IO], window: int = 3, strip_tags: bool = False,
+                rolling_overlap: int = 0) -> str:
+    return finalize_text(iter_vtt_lines(vtt), window=window, strip_tags=strip_tags,
+                         rolling_overlap=rolling_overlap)
@@ -0,0 +1,156 @@
+# ok_mvp/usage_utils.py
+"""
+Token and latency accounting for LLM calls.
+
+Every chat completion (see concurrency_utils.chat_completion and stream_utils.stream_chat_json)
+is recorded with its model, stage, prompt / completion / cached tokens, wall time (including
+limiter waits and retries) and, for streamed calls, time to first token. Stage and submission
+come from the caller's context (`llm_usage`), which asyncio tasks and `asyncio.to_thread`
+inherit, so nested code does not have to pass them along.
+
+Each script writes its calls to output/<submission>/usage_report.json, next to hypotheses.json,
+merged with what earlier scripts recorded there and rolled up per stage, model and prompt
+version (with cached-token hit rates, see prompt_utils).
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .chunk_utils import get_token_counter
+from .logger import get_logger
+from .prompt_utils import prompt_catalog, prompt_of
+
+logger = get_logger()
+
+USAGE_REPORT_NAME = "usage_report.json"
+
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar("llm_stage", default="other")
+_submission: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_submission", default=None)
+_calls: List[dict] = []
+_calls_lock = threading.Lock()
+
+
+@contextmanager
+def llm_usage(stage: Optional[str] = None, submission_id: Optional[str] = None):
+    """Attribute the LLM calls made inside this block to `stage` and/or `submission_id`."""
+    tokens = [var.set(value) for var, value in ((_stage, stage), (_submission, submission_id)) if value]
+    try:
+        yield
+    finally:
+        for token in reversed(tokens):
+            token.var.reset(token)
+
+
+def record_llm_call(request: dict, usage, seconds: float, ttft: Optional[float] = None, content: str = "",
+                    error: Optional[Exception] = None) -> dict:
+    """
+    Record one call from the SDK's `usage` object. When the backend sent none (e.g. a stream
+    without usage, or a failed call), the tokens are estimated from the request and `content`.
+    """
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        prompt, completion = usage.prompt_tokens or 0, usage.completion_tokens or 0
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    else:
+        count = get_token_counter()
+        prompt = sum(count(str(m.get("content", ""))) for m in request.get("messages", []))
+        completion, cached = count(content) if content else 0, 0
+    prompt_used = prompt_of(request)
+    call = {"stage": _stage.get(), "submission_id": _submission.get(), "model": request.get("model"),
+            "prompt": prompt_used.id if prompt_used else None,
+            "prompt_tokens": prompt, "completion_tokens": completion, "cached_tokens": cached,
+            "seconds": round(seconds, 3), "ttft": round(ttft, 3) if ttft is not None else None,
+            "estimated": usage is None, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if error is not None:
+        call["error"] = str(error)[:200]
+    with _calls_lock:
+        _calls.append(call)
+    return call
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def _rollup(calls: List[dict]) -> dict:
+    failed = sum(1 for c in calls if c.get("error"))
+    seconds = [c["seconds"] for c in calls]
+    ttfts = [c["ttft"] for c in calls if c.get("ttft") is not None]
+    prompt = sum(c["prompt_tokens"] for c in calls)
+    return {
+        "calls": len(calls),
+        "failed": failed,
+        "prompt_tokens": prompt,
+        "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        "cached_tokens": sum(c["cached_tokens"] for c in calls),
+        "cached_share": round(sum(c["cached_tokens"] for c in calls) / prompt, 3) if prompt else 0.0,
+        "cache_hit_rate": round(sum(1 for c in calls if c["cached_tokens"]) / len(calls), 3) if calls else 0.0,
+        "seconds_total": round(sum(seconds), 3),
+        "seconds_p50": _percentile(seconds, 0.5),
+        "seconds_p95": _percentile(seconds, 0.95),
+        "ttft_p50": _percentile(ttfts, 0.5),
+    }
+
+
+def usage_report(calls: List[dict]) -> dict:
+    """
+    Totals plus per-stage, per-model and per-prompt rollups of `calls`, stages sorted by wall time.
+    Prompt rollups also give the prompt's static prefix size and whether it reaches the provider's
+    caching minimum on its own.
+    """
+    by: Dict[str, Dict[str, List[dict]]] = {"stage": {}, "model": {}, "prompt": {}}
+    for call in calls:
+        for field in by:
+            by[field].setdefault(call.get(field) or "unknown", []).append(call)
+    stages = {k: _rollup(v) for k, v in by["stage"].items()}
+    catalog = prompt_catalog()
+    return {
+        "totals": _rollup(calls),
+        "by_stage": dict(sorted(stages.items(), key=lambda kv: -kv[1]["seconds_total"])),
+        "by_model": {k: _rollup(v) for k, v in by["model"].items()},
+        "by_prompt": {k: {**_rollup(v), **catalog.get(k, {})} for k, v in by["prompt"].items()},
+        "calls": calls,
+    }
+
+
+def take_calls(submission_id: Optional[str]) -> List[dict]:
+    """Remove and return the calls recorded in this process for `submission_id`."""
+    with _calls_lock:
+        mine = [c for c in _calls if c["submission_id"] == submission_id]
+        _calls[:] = [c for c in _calls if c["submission_id"] != submission_id]
+    return mine
+
+
+def write_usage_report(submission_id: str, submission_dir: str) -> Optional[str]:
+    """
+    Move this process's calls for `submission_id` into `submission_dir`/usage_report.json,
+    merged with the calls already recorded there. Returns the path (None if nothing was recorded).
+    """
+    mine = take_calls(submission_id)
+    if not mine:
+        return None
+    path = os.path.join(submission_dir, USAGE_REPORT_NAME)
+    previous: List[dict] = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("calls", [])
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Usage] Could not read {path} ({e}); starting a new report.")
+    report = usage_report(previous + mine)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    totals = report["totals"]
+    logger.info(f"[Usage] {len(mine)} LLM calls recorded for {submission_id}; submission totals: "
+                f"{totals['prompt_tokens']:,} prompt / {totals['completion_tokens']:,} completion tokens "
+                f"in {totals['calls']} calls.")
+    return path
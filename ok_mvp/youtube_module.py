@@ -1,28 +1,62 @@
 # ok_mvp/youtube_module.py
 import asyncio
-import requests
+import time
+from collections import Counter
 from yt_dlp import YoutubeDL
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
 
 # Assuming these utilities are in your project
 from .text_utils import vtt_to_text, finalize_text
 from .cache_utils import get_from_cache, save_to_cache
+from .http_utils import http_get
+from .config import (
+    YOUTUBE_FLAT_SEARCH,
+    YOUTUBE_HEDGED_FETCH,
+    YOUTUBE_HEDGE_DELAY,
+    YOUTUBE_ROLLING_CAPTION_OVERLAP,
+)
 from .logger import get_logger
 
 logger = get_logger()
 
-def _search_videos(query, limit):
+# Which path produced each transcript this process: "cache", "api", "vtt" or "none".
+_transcript_stats = Counter()
+
+def get_transcript_stats():
+    """Return a copy of the per-path transcript win counts."""
+    return dict(_transcript_stats)
+
+def _search_videos(query, limit, flat=False):
     logger.info(f"  [YouTube] Searching for top {limit} videos for query: '{query}'")
-    with YoutubeDL({"quiet": True, "skip_download": True, "extract_flat": False, "noplaylist": True}) as ydl:
+    started = time.perf_counter()
+    with YoutubeDL({"quiet": True, "skip_download": True, "extract_flat": flat, "noplaylist": True}) as ydl:
         info = ydl.extract_info(f"ytsearch{limit}:{query}", download=False)
     entries = info.get("entries", []) if isinstance(info, dict) else []
     out = [{"video_id": e.get("id", ""), "title": e.get("title", e.get("id", "")),
             "author": e.get("uploader") or e.get("channel") or "N/A",
             "url": e.get("webpage_url") or f"https://www.youtube.com/watch?v={e.get('id', '')}",
-            "raw_info": e} for e in entries if isinstance(e, dict)]
-    logger.info(f"  [YouTube] Found {len(out)} videos.")
+            "raw_info": e, "resolved": not flat} for e in entries if isinstance(e, dict)]
+    mode = "flat" if flat else "full"
+    logger.info(f"  [YouTube] Found {len(out)} videos ({mode} search, {time.perf_counter() - started:.2f}s).")
     return out
 
+def _resolve_video_info(video):
+    """Run the full yt-dlp extraction for a flat search hit so its caption URLs become available."""
+    if video.get("resolved"): return video
+    started = time.perf_counter()
+    try:
+        with YoutubeDL({"quiet": True, "skip_download": True, "noplaylist": True}) as ydl:
+            info = ydl.extract_info(video["url"], download=False)
+    except Exception as e:
+        logger.error(f"  [YouTube] Could not resolve metadata for {video.get('video_id')}: {e}")
+        return video
+    if isinstance(info, dict):
+        video["raw_info"] = info
+        video["author"] = info.get("uploader") or info.get("channel") or video.get("author", "N/A")
+    video["resolved"] = True
+    logger.info(f"  [YouTube] Resolved metadata for {video.get('video_id')} in {time.perf_counter() - started:.2f}s.")
+    return video
+
 def _fetch_transcript_from_api(video_id):
     try:
         transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
@@ -46,44 +80,108 @@ def _fetch_transcript_from_vtt(video_info):
         if caption_url: break
     if not caption_url: return None
     try:
-        return vtt_to_text(requests.get(caption_url, timeout=30).text)
+        return vtt_to_text(http_get(caption_url, timeout=30).text, rolling_overlap=YOUTUBE_ROLLING_CAPTION_OVERLAP)
     except Exception:
         return None
 
-async def _get_transcript(video):
+async def _fetch_transcript_via_vtt(video):
+    # Flat search hits carry no caption URLs; only now pay for the full extraction.
+    if not video.get("resolved"):
+        await asyncio.to_thread(_resolve_video_info, video)
+    return await asyncio.to_thread(_fetch_transcript_from_vtt, video)
+
+async def _fetch_transcript_hedged(video, delay):
+    """
+    Race the Transcript API against the VTT path and return (transcript, winner).
+
+    The VTT path starts after `delay` seconds, or immediately once the API call has
+    finished without a usable transcript. The losing task is cancelled; a worker thread
+    that is already running is left to finish and its result is discarded.
+    """
+    api_finished = asyncio.Event()
+
+    async def api_path():
+        try:
+            return await asyncio.to_thread(_fetch_transcript_from_api, video["video_id"])
+        finally:
+            api_finished.set()
+
+    async def vtt_path():
+        if delay > 0:
+            try:
+                await asyncio.wait_for(api_finished.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        return await _fetch_transcript_via_vtt(video)
+
+    tasks = {asyncio.create_task(api_path()): "api", asyncio.create_task(vtt_path()): "vtt"}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result():
+                    return task.result(), tasks[task]
+        return None, "none"
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _get_transcript(video, hedge_delay=None):
     video_id = video.get("video_id")
     if not video_id: return None
     await asyncio.sleep(1)
     cached = get_from_cache("youtube", video_id)
-    if cached: return cached
-    
-    transcript = await asyncio.to_thread(_fetch_transcript_from_api, video_id)
-    if not transcript:
-        transcript = await asyncio.to_thread(_fetch_transcript_from_vtt, video)
-    
+    if cached:
+        _transcript_stats["cache"] += 1
+        return cached
+
+    if hedge_delay is not None:
+        transcript, winner = await _fetch_transcript_hedged(video, hedge_delay)
+    else:
+        transcript, winner = await asyncio.to_thread(_fetch_transcript_from_api, video_id), "api"
+        if not transcript:
+            transcript, winner = await _fetch_transcript_via_vtt(video), "vtt"
+    _transcript_stats[winner if transcript else "none"] += 1
+
     if transcript:
         save_to_cache("youtube", video_id, transcript)
         return transcript
     return None
 
-async def research(search_terms: list[str], config: dict) -> tuple:
+async def research(search_terms: list[str], config: dict, on_source=None) -> tuple:
     print("  Calling YouTube Module...")
     max_results = config.get("MAX_RESULTS_PER_SOURCE", 3)
+    flat = config.get("YOUTUBE_FLAT_SEARCH", YOUTUBE_FLAT_SEARCH)
+    hedged = config.get("YOUTUBE_HEDGED_FETCH", YOUTUBE_HEDGED_FETCH)
+    hedge_delay = config.get("YOUTUBE_HEDGE_DELAY", YOUTUBE_HEDGE_DELAY) if hedged else None
     main_query = search_terms[0] if search_terms else ""
     if not main_query: return [], []
 
-    videos = await asyncio.to_thread(_search_videos, main_query, max_results)
+    videos = await asyncio.to_thread(_search_videos, main_query, max_results, flat)
     
-    source_evidence, content_for_synthesis = [], []
-    transcripts = await asyncio.gather(*[_get_transcript(video) for video in videos])
-
-    for idx, transcript in enumerate(transcripts):
-        if transcript and transcript.strip():
-            video = videos[idx]
-            source_evidence.append({
-                "index": -1, "source_type": "YouTube", "title": video.get("title", ""),
-                "author": video.get("author", "N/A"), "url": video.get("url", ""),
-                "key_quote": "",
-            })
-            content_for_synthesis.append(finalize_text(transcript.splitlines()))
+    async def fetch(video):
+        transcript = await _get_transcript(video, hedge_delay)
+        if not (transcript and transcript.strip()):
+            return None
+        evidence = {
+            "index": -1, "source_type": "YouTube", "title": video.get("title", ""),
+            "author": video.get("author", "N/A"), "url": video.get("url", ""),
+            "key_quote": "",
+        }
+        text = finalize_text(transcript.splitlines(), rolling_overlap=YOUTUBE_ROLLING_CAPTION_OVERLAP)
+        # Hand each transcript on as soon as it lands; the returned lists keep search order.
+        if on_source: on_source(evidence, text)
+        return evidence, text
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[fetch(video) for video in videos])
+    resolved = sum(1 for v in videos if v.get("resolved")) if flat else 0
+    logger.info(f"  [YouTube] Transcript phase took {time.perf_counter() - started:.2f}s "
+                f"({resolved}/{len(videos)} videos needed full metadata).")
+    logger.info(f"  [YouTube] Transcript sources so far: {get_transcript_stats()}")
+
+    found = [result for result in results if result]
+    source_evidence = [evidence for evidence, _ in found]
+    content_for_synthesis = [text for _, text in found]
     return source_evidence, content_for_synthesis
\ No newline at end of file